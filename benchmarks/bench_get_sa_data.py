@@ -0,0 +1,44 @@
+"""
+Benchmark loading a directory of SALib analysis files with get_sa_data(),
+comparing the serial path with the process and thread pool modes.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_get_sa_data.py [path] [workers]
+
+The default path is the full ligpy sensitivity analysis results directory.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from savvy.data_processing import get_sa_data
+
+
+def best_time(func, repeat=3, **kwargs):
+    """Return the best wall clock time of `repeat` calls to func."""
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func(**kwargs)
+        times.append(time.time() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    path = (sys.argv[1] if len(sys.argv) > 1 else
+            os.path.join(os.path.dirname(__file__), '..',
+                         'ligpy_sensitivity_analysis_results/'))
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    serial = best_time(get_sa_data, path=path)
+    print('serial              : %.3f s' % serial)
+    for executor in ['process', 'thread']:
+        parallel = best_time(get_sa_data, path=path, workers=workers,
+                             executor=executor)
+        print('%-7s (%2i workers): %.3f s  (%.1fx)'
+              % (executor, workers, parallel, serial / parallel))
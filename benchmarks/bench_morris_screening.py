@@ -0,0 +1,86 @@
+"""
+Benchmark a Morris screening stage in front of the Sobol analysis on the
+Sobol G function, where only a few of the parameters matter.
+
+The full pipeline (gen_params() for every parameter, then
+sobol_indices()) is compared with screening first (gen_morris_params()
+and screen_params()) and running the Sobol analysis on the reduced
+problem.  The model runs are counted, since for a real model they are
+the dominant cost, and the total first order indices of the important
+parameters are compared.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_morris_screening.py [num_vars] [n] [r]
+
+The defaults are 100 parameters, n = 512 and r = 20 trajectories.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from savvy.sensitivity_tools import (gen_params, gen_morris_params,
+                                     screen_params, expand_params,
+                                     sobol_indices)
+
+
+def g_function(X, a):
+    """The Sobol G function on the unit hypercube; parameters with a small
+    `a` are important and those with a large `a` are nearly inert."""
+    return np.prod((np.abs(4 * X - 2) + a) / (1 + a), axis=1)
+
+
+def run_sobol(num_vars, names, bounds, n, model, save_loc):
+    """Sample, run the model and analyze; return the indices, the number
+    of model runs and the wall clock time."""
+    start = time.time()
+    X = gen_params(num_vars, names, bounds, n, save_loc)
+    Y = model(X)
+    problem = {'num_vars': num_vars, 'names': names, 'bounds': bounds}
+    Si = sobol_indices(problem, Y, seed=1)
+    return Si, len(X), time.time() - start
+
+
+if __name__ == '__main__':
+    num_vars = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    r = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    names = ['x%i' % i for i in range(num_vars)]
+    bounds = [[0, 1]] * num_vars
+    a = np.full(num_vars, 99.)
+    a[:4] = [0, 1, 4.5, 9]
+    save_loc = tempfile.mkdtemp()
+
+    print('Full Sobol analysis, %i parameters' % num_vars)
+    full, full_runs, full_time = run_sobol(
+        num_vars, names, bounds, n, lambda X: g_function(X, a), save_loc)
+    print('  %i model runs, %.2f s' % (full_runs, full_time))
+
+    print('Morris screening, then Sobol on the kept parameters')
+    start = time.time()
+    X = gen_morris_params(num_vars, names, bounds, r, seed=1)
+    problem = {'num_vars': num_vars, 'names': names, 'bounds': bounds}
+    ranking, reduced = screen_params(problem, X, g_function(X, a), seed=1)
+    print('  kept %s' % ', '.join(reduced['names']))
+    small, small_runs, _ = run_sobol(
+        reduced['num_vars'], reduced['names'], reduced['bounds'], n,
+        lambda X: g_function(expand_params(X, reduced, names), a), save_loc)
+    screened_time = time.time() - start
+    screened_runs = len(X) + small_runs
+    print('  %i model runs (%i screening), %.2f s'
+          % (screened_runs, len(X), screened_time))
+    print('%.1fx fewer model runs, %.1fx faster'
+          % (full_runs / float(screened_runs), full_time / screened_time))
+
+    print('ST of the kept parameters (full / screened):')
+    for i, name in enumerate(reduced['names']):
+        print('  %-5s %.3f / %.3f' % (name, full['ST'][names.index(name)],
+                                      small['ST'][i]))
@@ -11,9 +11,58 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import glob
+import gzip
+import hashlib
+import io
+import json
+import lzma
 import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
+import numpy as np
 import pandas as pd
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bump this when the format of cached results changes
+_CACHE_VERSION = 4
+# Number of second order rows to read at a time when filtering them
+_S2_CHUNKSIZE = 20000
+# Ways of handling negative sensitivity indices, and the small positive
+# value they are set to by the default 'clip' policy
+_NEGATIVE_POLICIES = ('clip', 'zero', 'keep', 'nan')
+_NEGATIVE_EPSILON = 0.0001
+# Kinds of pool used to load analysis files in parallel
+_EXECUTORS = ('process', 'thread')
+# Compressed analysis files that are decompressed while they are parsed
+_COMPRESSED_SUFFIXES = ('.gz', '.xz', '.zst')
+# First bytes of a file written by export_sa_data(), and the format version
+_STORE_MAGIC = b'SAVVYSA'
+_STORE_VERSION = 1
+# Arrays in the store start at multiples of this many bytes
+_STORE_ALIGN = 64
+# State of each row of a merged results file, and the number of per-run
+# files merged between checkpoints
+_MERGE_MISSING = 0
+_MERGE_DONE = 1
+_MERGE_FAILED = 2
+_MERGE_BATCH = 10000
+# The run number at the end of a per-run results file name
+_RUN_NUMBER = re.compile(r'(\d+)\D*$')
+# Errors that mark a per-run results file as failed rather than stopping
+# the merge
+_RUN_ERRORS = (IOError, ValueError, EOFError, lzma.LZMAError)
+if zstandard is not None:
+    _RUN_ERRORS += (zstandard.ZstdError,)
 
 
 def _map_pretty_names(df, column_names, pretty_names):
@@ -22,10 +71,40 @@ def _map_pretty_names(df, column_names, pretty_names):
     return df 
 
 
+def _salib_names(salib_output):
+    """
+    Return the parameter (or group) names of a SALib.analyze.sobol result
+    in the order of its index arrays, or None if the result does not carry
+    the problem it was computed for.
+    """
+    problem = getattr(salib_output, 'problem', None)
+    if not problem:
+        return None
+    if problem.get('groups'):
+        return np.asarray(pd.unique(np.asarray(problem['groups'],
+                                               dtype=object)))
+    return np.asarray(problem['names'], dtype=object)
+
+
+def _split_pairs(index):
+    """
+    Split an index of (parameter 1, parameter 2) tuples into two arrays of
+    names without building a Series per row.
+    """
+    if not isinstance(index, pd.MultiIndex):
+        index = pd.MultiIndex.from_tuples(list(index))
+    return (np.asarray(index.get_level_values(0), dtype=object),
+            np.asarray(index.get_level_values(1), dtype=object))
+
+
 def format_salib_output(salib_output, run_name, pretty_names=None):
     """
     Function reads the output of SALib.analyze and returns a dictionary that savvy expects.
 
+    The dataframes are built straight from the index arrays of
+    `salib_output` (the upper triangle of the S2 matrix is taken with
+    numpy) so this stays fast when there are many parameter pairs.
+
     Parameters
     ----------
     path      : dict
@@ -39,37 +118,475 @@ def format_salib_output(salib_output, run_name, pretty_names=None):
 
     Returns   : dict
     """
+    names = _salib_names(salib_output)
+    if names is None:
+        return {run_name: _salib_df_list_from_frames(salib_output,
+                                                     pretty_names)}
+    if pretty_names:
+        names = pd.Series(names).map(pretty_names).fillna(
+            pd.Series(names)).values
+
+    # combine ST and S1 the way SALib's to_df() lists them
+    first = pd.DataFrame({'ST': salib_output['ST'],
+                          'ST_conf': salib_output['ST_conf'],
+                          'S1': salib_output['S1'],
+                          'S1_conf': salib_output['S1_conf'],
+                          'Parameter': names})
+
+    if 'S2' not in salib_output:
+        return {run_name: [first, False]}
+
+    i, j = np.triu_indices(len(names), 1)
+    second = pd.DataFrame({'S2': np.asarray(salib_output['S2'])[i, j],
+                           'S2_conf': np.asarray(
+                               salib_output['S2_conf'])[i, j],
+                           'Parameter_1': names[i],
+                           'Parameter_2': names[j]})
+
+    return {run_name: [first, second]}
+
+
+def _salib_df_list_from_frames(salib_output, pretty_names=None):
+    """
+    Build the [first/total, second order] dataframes of format_salib_output
+    from salib_output.to_df(), for results that do not know their problem.
+    """
     df_list = salib_output.to_df()
 
     # combine S1 and ST
-    df_list[0] = pd.concat((df_list[0], df_list[1]), axis=1)
-    df_list.pop(1)
-
-    # Make the Parameter Column
-    # for i, _ in enumerate(df_list):
-    df_list[0]['Parameter'] = df_list[0].index
+    first = pd.concat((df_list[0], df_list[1]), axis=1)
+    first['Parameter'] = first.index
     if pretty_names:
-        df_list[0] = _map_pretty_names(df_list[0], ['Parameter'], pretty_names)
-    df_list[0].reset_index(inplace=True, drop=True)
+        first = _map_pretty_names(first, ['Parameter'], pretty_names)
+    first.reset_index(inplace=True, drop=True)
+
+    if len(df_list) < 3:
+        return [first, False]
 
     # split up the parameters from S2
-    df_list[-1][['Parameter_1', 'Parameter_2']] = df_list[-1].index.to_series().apply(pd.Series)
-    df_list[-1].reset_index(inplace=True, drop=True)
+    second = df_list[2]
+    second['Parameter_1'], second['Parameter_2'] = _split_pairs(
+        second.index)
+    second.reset_index(inplace=True, drop=True)
     if pretty_names:
-        df_list[-1] = _map_pretty_names(df_list[-1], ['Parameter_1', 'Parameter_2'], pretty_names)
+        second = _map_pretty_names(second, ['Parameter_1', 'Parameter_2'],
+                                   pretty_names)
+
+    return [first, second]
+
+
+def format_salib_outputs(salib_outputs, pretty_names=None):
+    """
+    Build a whole sa_dict from in-memory SALib.analyze results, without
+    writing them out as analysis files and reading them back in with
+    get_sa_data().
+
+    Parameters
+    ----------
+    salib_outputs : dict
+                    a dictionary whose keys are the names of the outputs
+                    and whose values are the SALib.analyze.sobol results
+                    for them.
+    pretty_names  : dict, optional
+                    a dictionary mapping old parameter names to new names.
+
+    Returns
+    --------
+    sa_dict : dict
+              a dictionary in the same format as the one returned by
+              get_sa_data(); the parameter name columns of all the
+              dataframes are categoricals that share one vocabulary.
+    """
+    sa_dict = {}
+    for run_name, salib_output in salib_outputs.items():
+        sa_dict.update(format_salib_output(salib_output, run_name,
+                                           pretty_names))
+    _share_vocabulary(sa_dict.values())
+
+    return sa_dict
+
+
+def _as_categorical(names):
+    """
+    Return a categorical of parameter names whose categories are in the
+    order the names first appear.
+    """
+    codes, categories = pd.factorize(np.asarray(names, dtype=object))
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _share_vocabulary(df_lists, vocabulary=()):
+    """
+    Replace the parameter name columns (Parameter, Parameter_1 and
+    Parameter_2) of all the dataframes in `df_lists` by categoricals that
+    share one vocabulary of parameter names, so each name is stored once
+    and names can be compared as integer codes.  'rxn' is changed to 'k'
+    in the vocabulary for consistency with the inputs file.
+
+    New names are appended to `vocabulary` (if given), so codes of
+    dataframes that already use it stay the same.  Returns the vocabulary
+    (a pandas Index of names).
+    """
+    columns = [(df, col) for df_list in df_lists for df in df_list
+               if isinstance(df, pd.DataFrame)
+               for col in df.columns if col.startswith('Parameter')]
+    for df, col in columns:
+        if not hasattr(df[col], 'cat'):
+            df[col] = _as_categorical(df[col])
+    renamed = [np.array([re.sub('rxn', 'k', name, flags=re.IGNORECASE)
+                         for name in df[col].cat.categories], dtype=object)
+               for df, col in columns]
+
+    # categories are listed in the order names first appear, starting with
+    # the first/total order frames, so the vocabulary keeps parameter order
+    vocabulary = pd.Index(pd.unique(np.concatenate(
+        [np.asarray(vocabulary, dtype=object)] + renamed)))
+    dtype = pd.api.types.CategoricalDtype(vocabulary)
+    for (df, col), names in zip(columns, renamed):
+        codes = df[col].cat.codes.values
+        recode = vocabulary.get_indexer(names)
+        df[col] = pd.Categorical.from_codes(
+            np.where(codes < 0, -1, recode[codes]), dtype=dtype)
+
+    return vocabulary
+
+
+def _parse_block(block):
+    """
+    Parse the first/total order block of an analysis file (a header line
+    followed by one row per parameter) into a dataframe, writing the
+    values straight into a preallocated float array.
+    """
+    header = block.split('\n', 1)[0].split()
+    tokens = block.split()
+    ncols = len(header)
+    if len(tokens) % ncols:
+        raise ValueError('Malformed sensitivity analysis block with header '
+                         '%s' % header)
+    nrows = len(tokens) // ncols - 1
+
+    # Parameter name columns come first, followed by the numerical indices
+    num_names = len([col for col in header if col.startswith('Parameter')])
+    values = np.empty((nrows, ncols - num_names))
+    for i in range(num_names, ncols):
+        values[:, i - num_names] = tokens[ncols + i::ncols]
+
+    columns = {}
+    for i, col in enumerate(header):
+        if i < num_names:
+            columns[col] = _as_categorical(tokens[ncols + i::ncols])
+        else:
+            columns[col] = values[:, i - num_names]
+
+    return pd.DataFrame(columns, columns=header)
+
+
+def _top_rows(values, k):
+    """Return the positions of the k highest values (NaN never counts)."""
+    if len(values) <= k:
+        return np.flatnonzero(~np.isnan(values))
+    return np.argpartition(-values, max(k, 1) - 1)[:k]
+
+
+def _filter_second_order(reader, columns, s2_min=None, s2_top_k=None):
+    """
+    Read the second order block in chunks from `reader` (a pandas
+    TextFileReader) and only keep the rows with S2 >= s2_min and/or the
+    s2_top_k rows with the highest S2.  The top rows are kept in a bounded
+    buffer that is pruned after every chunk, so memory scales with the
+    number of rows kept rather than the number of rows in the file.  Rows
+    are returned in the order they appear in the file.
+    """
+    kept = []
+    offset = 0
+    for chunk in reader:
+        s2 = chunk['S2'].values
+        rows = np.arange(len(s2))
+        if s2_min is not None:
+            rows = rows[s2 >= s2_min]
+        if s2_top_k is not None:
+            rows = rows[_top_rows(s2[rows], s2_top_k)]
+        # only the names of the rows that are kept are turned into strings
+        part = dict((col, np.asarray(chunk[col].values[rows], dtype=object)
+                     if col.startswith('Parameter')
+                     else chunk[col].values[rows]) for col in columns)
+        part['row'] = rows + offset
+        offset += len(s2)
+        kept.append(part)
+        if s2_top_k is not None and len(kept) > 1:
+            merged = dict((col, np.concatenate([k[col] for k in kept]))
+                          for col in part)
+            top = _top_rows(merged['S2'], s2_top_k)
+            kept = [dict((col, merged[col][top]) for col in merged)]
+
+    order = np.argsort(np.concatenate([k['row'] for k in kept] or [[]]),
+                       kind='mergesort')
+    data = {}
+    for col in columns:
+        values = np.concatenate([k[col] for k in kept] or [[]])[order]
+        data[col] = (_as_categorical(values) if col.startswith('Parameter')
+                     else values.astype(np.float64))
+    return pd.DataFrame(data, columns=columns)
+
+
+def _open_analysis_file(filename):
+    """
+    Open an analysis file for reading as text, decompressing it on the fly
+    if its name ends with .gz, .xz or .zst.
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    elif filename.endswith('.xz'):
+        return lzma.open(filename, 'rt')
+    elif filename.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError('zstandard is not installed - please install '
+                              'it to read %s' % filename)
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(
+            open(filename, 'rb'), closefd=True))
+    else:
+        return open(filename)
+
+
+def _parse_analysis_file(filename, s2_min=None, s2_top_k=None):
+    """
+    Read a SALib sobol analysis file with a single pass over the file and
+    return a list with the first/total order dataframe and the second
+    order dataframe (or False if the file has no second order indices).
+
+    The first/total order block is separated from the second order block
+    by the first blank line in the file.  If s2_min or s2_top_k are given
+    only the qualifying second order rows are kept while reading (see
+    _filter_second_order()).  Compressed files are decompressed as they
+    are read (see _open_analysis_file()).
+    """
+    with _open_analysis_file(filename) as result:
+        # Stream the first/total order block up to the blank separator line
+        lines = []
+        for line in result:
+            if line.startswith('\n'):
+                break
+            lines.append(line)
+        df_first_total = _parse_block(''.join(lines))
+
+        # The rest of the open file is the second order block.  Passing the
+        # header and dtypes to the C tokenizer lets it fill the float
+        # columns directly without re-reading or type sniffing, and store
+        # the names as categoricals instead of one string per row.
+        header = result.readline().split()
+        if not header:
+            return [df_first_total, False]
+        dtypes = dict((col, 'category' if col.startswith('Parameter')
+                       else np.float64) for col in header)
+        if s2_min is None and s2_top_k is None:
+            df_second = pd.read_csv(result, sep=' ', header=None,
+                                    names=header, dtype=dtypes)
+        else:
+            reader = pd.read_csv(result, sep=' ', header=None, names=header,
+                                 dtype=dtypes, chunksize=_S2_CHUNKSIZE)
+            df_second = _filter_second_order(reader, header, s2_min,
+                                             s2_top_k)
+
+    return [df_first_total, df_second]
+
+
+class SecondOrderMatrix(object):
+    """
+    Second order sensitivity indices for one output measure, stored as two
+    dense parameter x parameter float32 arrays (S2 and S2_conf) instead of
+    a long dataframe with one row per pair of parameters.
+
+    Parameter names are mapped to integer ids once, so looking up the
+    interaction between two parameters or all the interactions of one
+    parameter does not need to scan the data.  Entry [i, j] holds the
+    index for the pair (names[i], names[j]) in the orientation it was
+    reported by SALib (Parameter_1, Parameter_2), which for SALib output is
+    the upper triangle; pairs that were not reported are NaN.
+
+    Parameters
+    -----------
+    names   : list
+              the parameter names, in the order of the rows and columns of
+              the arrays.
+    s2      : numpy ndarray
+              square array of second order indices.
+    s2_conf : numpy ndarray
+              square array with the confidence intervals of s2.
+    """
+
+    def __init__(self, names, s2, s2_conf):
+        self.names = list(names)
+        self.index = dict((name, i) for i, name in enumerate(self.names))
+        self.s2 = s2
+        self.s2_conf = s2_conf
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Build a SecondOrderMatrix from a second order dataframe with
+        Parameter_1, Parameter_2, S2 and S2_conf columns (as returned by
+        get_sa_data()).  If the names are categoricals sharing one
+        vocabulary, the matrix is indexed by the whole vocabulary.
+        """
+        if (hasattr(df['Parameter_1'], 'cat') and
+                df['Parameter_1'].dtype == df['Parameter_2'].dtype):
+            # names already share a vocabulary, so use its codes as the ids
+            names = df['Parameter_1'].cat.categories
+            ids_1 = df['Parameter_1'].cat.codes.values
+            ids_2 = df['Parameter_2'].cat.codes.values
+        else:
+            names = pd.unique(np.concatenate((
+                np.asarray(df['Parameter_1'], dtype=object),
+                np.asarray(df['Parameter_2'], dtype=object))))
+            ids_1 = pd.Categorical(df['Parameter_1'], categories=names).codes
+            ids_2 = pd.Categorical(df['Parameter_2'], categories=names).codes
+
+        s2 = np.full((len(names), len(names)), np.nan, dtype=np.float32)
+        s2_conf = np.full_like(s2, np.nan)
+        s2[ids_1, ids_2] = df['S2'].values
+        s2_conf[ids_1, ids_2] = df['S2_conf'].values
+
+        return cls(names, s2, s2_conf)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load a SecondOrderMatrix written with save().  By default the
+        arrays are memory-mapped from disk rather than read into memory.
+        """
+        names = np.load(os.path.join(directory, 'names.npy'))
+        s2 = np.load(os.path.join(directory, 'S2.npy'), mmap_mode=mmap_mode)
+        s2_conf = np.load(os.path.join(directory, 'S2_conf.npy'),
+                          mmap_mode=mmap_mode)
+        return cls(names.tolist(), s2, s2_conf)
+
+    def save(self, directory):
+        """Save the names and arrays as .npy files in `directory`."""
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        np.save(os.path.join(directory, 'names.npy'),
+                np.array(self.names, dtype=str))
+        np.save(os.path.join(directory, 'S2.npy'), self.s2)
+        np.save(os.path.join(directory, 'S2_conf.npy'), self.s2_conf)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, param_1, param_2, mirror=True):
+        """
+        Return (S2, S2_conf) for a pair of parameters, or (nan, nan) if the
+        pair is not present.  If mirror is True the pair is also looked up
+        in the reverse order.
+        """
+        i = self.index.get(param_1)
+        j = self.index.get(param_2)
+        if i is None or j is None:
+            return float('nan'), float('nan')
+        if mirror and np.isnan(self.s2[i, j]):
+            i, j = j, i
+        return float(self.s2[i, j]), float(self.s2_conf[i, j])
+
+    def row(self, param):
+        """
+        Return a dataframe with the second order indices of every
+        parameter that interacts with `param`.
+        """
+        i = self.index[param]
+        s2 = np.where(np.isnan(self.s2[i]), self.s2[:, i], self.s2[i])
+        s2_conf = np.where(np.isnan(self.s2[i]), self.s2_conf[:, i],
+                           self.s2_conf[i])
+        found = ~np.isnan(s2)
+        return pd.DataFrame({'Parameter': self._names(np.flatnonzero(found)),
+                             'S2': s2[found], 'S2_conf': s2_conf[found]},
+                            columns=['Parameter', 'S2', 'S2_conf'])
+
+    def max(self):
+        """Return the largest second order index."""
+        return float(np.nanmax(self.s2))
+
+    def top(self, n):
+        """
+        Return a dataframe (in the same format as get_sa_data()) with the
+        `n` pairs of parameters that have the highest second order indices.
+        """
+        flat = np.where(np.isnan(self.s2), -np.inf, self.s2).ravel()
+        n = min(n, int(np.count_nonzero(~np.isnan(self.s2))))
+        order = np.argsort(-flat, kind='mergesort')[:n]
+        return self._pairs(order)
 
-    return {run_name: df_list}
+    def to_dataframe(self):
+        """
+        Return the long dataframe format of the second order indices, with
+        one row for each pair of parameters.
+        """
+        return self._pairs(np.flatnonzero(~np.isnan(self.s2)))
 
+    def _names(self, ids):
+        # names are returned as categoricals over the whole matrix index
+        return pd.Categorical.from_codes(ids, categories=self.names)
 
+    def _pairs(self, flat_ids):
+        ids_1, ids_2 = np.unravel_index(flat_ids, self.s2.shape)
+        return pd.DataFrame({'Parameter_1': self._names(ids_1),
+                             'Parameter_2': self._names(ids_2),
+                             'S2': self.s2.ravel()[flat_ids].astype(float),
+                             'S2_conf': (self.s2_conf.ravel()[flat_ids]
+                                         .astype(float))},
+                            columns=['Parameter_1', 'Parameter_2', 'S2',
+                                     'S2_conf'])
 
 
-def read_file(path, numrows=None, drop=False, sep=','):
+def _count_rows(path):
+    """
+    Count the lines after the header of a text file by scanning it in
+    binary blocks (an upper bound on the number of data rows).
+    """
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _read_to_memmap(path, filename, numrows, usecols, sep, dtype, chunksize):
+    """
+    Stream a delimited file in chunks into a .npy file and return a
+    dataframe that is a view of the memory-mapped array.
+    """
+    columns = pd.read_csv(path, sep=sep, nrows=0, usecols=usecols).columns
+    nrows = _count_rows(path)
+    if numrows is not None:
+        nrows = min(nrows, numrows)
+    array = np.lib.format.open_memmap(filename, mode='w+',
+                                      dtype=dtype or np.float64,
+                                      shape=(nrows, len(columns)))
+    filled = 0
+    for chunk in pd.read_csv(path, sep=sep, nrows=numrows, usecols=usecols,
+                             dtype=dtype, chunksize=chunksize):
+        array[filled:filled + len(chunk)] = chunk.values
+        filled += len(chunk)
+    array.flush()
+
+    return pd.DataFrame(array[:filled], columns=columns, copy=False)
+
+
+def read_file(path, numrows=None, drop=False, sep=',', dtype=None,
+              chunksize=None, memmap=None):
     """
     Function reads a file of input parameters or model results
     and returns a pandas dataframe with its contents.
     The first line of the input should contain headers
     corresponding to the column names.
 
+    Columns named in `drop` are skipped while the file is parsed rather
+    than read and removed afterwards.  For files that are larger than
+    memory use `chunksize` to iterate over the file, or `memmap` to have
+    the file streamed into a memory-mapped array on disk.
+
     Parameters
     ----------
     path      : str
@@ -87,6 +604,18 @@ def read_file(path, numrows=None, drop=False, sep=','):
     sep       : str
                 string indicating the column separator in the
                 file (optional, default = ',').
+    dtype     : numpy dtype, optional
+                the dtype to parse the values as, for example np.float32
+                to halve the memory used (default is to let pandas infer
+                the dtypes, which is float64 for numbers).
+    chunksize : int, optional
+                if given (and memmap is not), return an iterator of
+                dataframes with `chunksize` rows each instead of one
+                dataframe.
+    memmap    : str, optional
+                the name of a .npy file to stream the values into.  The
+                returned dataframe is a view of the memory-mapped array, so
+                all the columns that are kept must be numerical.
 
     Returns
     --------
@@ -96,15 +625,22 @@ def read_file(path, numrows=None, drop=False, sep=','):
          columns named in "drop".
     """
 
-    df = pd.read_csv(path, sep=sep, nrows=numrows)
-    if not drop:
-        df.drop(drop, axis=1, inplace=True)
+    usecols = None
+    if drop:
+        drop = set(drop)
+        usecols = lambda col: col not in drop
+
+    if memmap is not None:
+        return _read_to_memmap(path, memmap, numrows, usecols, sep, dtype,
+                               chunksize or 100000)
 
-    return df
+    return pd.read_csv(path, sep=sep, nrows=numrows, usecols=usecols,
+                       dtype=dtype, chunksize=chunksize)
 
 
 def get_params(path='./input_parameters.csv',
-               numrows=None, drop=['End_time', 'Oxygen']):
+               numrows=None, drop=['End_time', 'Oxygen'], dtype=None,
+               chunksize=None, memmap=None):
     """
     NOTE: This function is specific to our lignin modeling dataset
           and is not needed for the visualization features of savvy
@@ -117,15 +653,19 @@ def get_params(path='./input_parameters.csv',
 
     Parameters
     ----------
-    path    : str, optional
-              string containing the path to the parameters csv.
-    numrows : int, optional
-              the number of rows of the input_parameters file to read
-              (default is to read all rows).
-    drop    : list, optional
-              a list of strings for which parameters you do not want to
-              include in the returned dataframe.  If you want all params
-              then pass drop=False.
+    path      : str, optional
+                string containing the path to the parameters csv.
+    numrows   : int, optional
+                the number of rows of the input_parameters file to read
+                (default is to read all rows).
+    drop      : list, optional
+                a list of strings for which parameters you do not want to
+                include in the returned dataframe.  If you want all params
+                then pass drop=False.
+    dtype     : numpy dtype, optional
+    chunksize : int, optional
+    memmap    : str, optional
+                see read_file().
 
     Returns
     -------
@@ -133,12 +673,14 @@ def get_params(path='./input_parameters.csv',
 
     """
 
-    return read_file(path, numrows=numrows, drop=drop)
+    return read_file(path, numrows=numrows, drop=drop, dtype=dtype,
+                     chunksize=chunksize, memmap=memmap)
 
 
 def get_results(path='./results.csv',
                 numrows=None, drop=['light_aromatic_C-C',
-                                    'light_aromatic_methoxyl']):
+                                    'light_aromatic_methoxyl'],
+                dtype=None, chunksize=None, memmap=None):
     """
     NOTE: This function is specific to our lignin modeling dataset
           and is not needed for the visualization features of savvy
@@ -149,25 +691,514 @@ def get_results(path='./results.csv',
 
     Parameters
     ----------
-    path    : str, optional
-              the path to the results csv file.
-    numrows : int, optional
-              the number of rows of the input_parameters file to read
-              (default is to read all rows).
-    drop    : list, optional
-              a list of strings for which output measures to drop from
-              the returned dataframe.  If you want all outputs use
-              drop=False.
+    path      : str, optional
+                the path to the results csv file.
+    numrows   : int, optional
+                the number of rows of the input_parameters file to read
+                (default is to read all rows).
+    drop      : list, optional
+                a list of strings for which output measures to drop from
+                the returned dataframe.  If you want all outputs use
+                drop=False.
+    dtype     : numpy dtype, optional
+    chunksize : int, optional
+    memmap    : str, optional
+                see read_file().
 
     Returns
     -------
     pandas dataframe
     """
 
-    return read_file(path, numrows=numrows, drop=drop)
+    return read_file(path, numrows=numrows, drop=drop, dtype=dtype,
+                     chunksize=chunksize, memmap=memmap)
+
+
+def _run_files(files):
+    """Return the list of files in a directory, matching a glob pattern,
+    or given as a list."""
+    if not isinstance(files, str):
+        return list(files)
+    if os.path.isdir(files):
+        return [os.path.join(files, name) for name in sorted(os.listdir(files))
+                if os.path.isfile(os.path.join(files, name))]
+    return sorted(glob.glob(files))
+
+
+def _run_row(filename):
+    """Return the row of a per-run results file: the last number in its
+    name."""
+    match = _RUN_NUMBER.search(os.path.basename(filename))
+    if match is None:
+        raise ValueError('there is no run number in the file name %s'
+                         % filename)
+    return int(match.group(1))
+
+
+def _read_run(filename, skiprows=0):
+    """
+    Return the values in a per-run results file as a 1D array, or None if
+    the file can not be read or holds no values.
+    """
+    try:
+        with _open_analysis_file(filename) as run:
+            lines = run.read().split('\n')[skiprows:]
+        values = np.array(' '.join(lines).replace(',', ' ').split(),
+                          dtype=np.float64)
+    except _RUN_ERRORS:
+        return None
+    return values if values.size else None
+
+
+def merge_results(files, results, row_index=None, num_rows=None,
+                  skiprows=0, workers=8):
+    """
+    Merge the results files written by each simulation into one results
+    matrix in parameter set order, a binary .npy file that can be passed
+    to analyze_outputs().
+
+    The files are read by a pool of threads.  Rows without a file are
+    flagged as missing and rows whose file can not be read (or has the
+    wrong number of values) as failed; both are NaN in the results.  The
+    state of each row is kept in `results`.status.npy, so merging again
+    into the same file only reads the files of rows that are not merged
+    yet, e.g. as new runs finish.
+
+    Parameters
+    ----------
+    files     : str or list
+                a directory holding the per-run files, a glob pattern
+                (e.g. 'runs/*.out') or a list of filenames.  Each file
+                holds the results of one run, separated by spaces, tabs,
+                commas or newlines.  Files ending in .gz, .xz or .zst are
+                decompressed.
+    results   : str
+                the name of the .npy file to write the results to.
+    row_index : dict or function, optional
+                the row of each file: a dict from filename (or file
+                basename) to row number, or a function that takes a
+                filename and returns its row.  Default is the last number
+                in the file name, e.g. run_0042.out is row 42.
+    num_rows  : int, optional
+                the number of parameter sets (default is one more than
+                the largest row found).  Needed to flag missing runs at
+                the end.
+    skiprows  : int, optional
+                the number of header lines at the start of each file.
+    workers   : int, optional
+                the number of threads reading files.
+
+    Returns
+    --------
+    results : numpy ndarray
+              the memory-mapped (rows, outputs) array of results.
+    missing : numpy ndarray
+              the rows that have no results file yet.
+    failed  : numpy ndarray
+              the rows whose results file could not be read.
+    """
+    status_file = results + '.status.npy'
+    # the merged files may be kept next to the runs
+    outputs = set(os.path.abspath(name) for name in (results, status_file))
+    files = [filename for filename in _run_files(files)
+             if os.path.abspath(filename) not in outputs]
+    if row_index is None:
+        rows = [_run_row(filename) for filename in files]
+    elif callable(row_index):
+        rows = [row_index(filename) for filename in files]
+    else:
+        rows = [row_index[filename] if filename in row_index
+                else row_index[os.path.basename(filename)]
+                for filename in files]
+
+    if os.path.isfile(results) and os.path.isfile(status_file):
+        output = np.lib.format.open_memmap(results, mode='r+')
+        status = np.load(status_file)
+        if num_rows is not None and num_rows != len(status):
+            raise ValueError('%s holds %i rows, not %i'
+                             % (results, len(status), num_rows))
+    else:
+        output = None
+        if num_rows is None:
+            num_rows = max(rows) + 1 if rows else 0
+        status = np.zeros(num_rows, dtype=np.int8)
+    outside = [row for row in rows if not 0 <= row < len(status)]
+    if outside:
+        raise ValueError('rows %s are outside the %i rows of the results'
+                         % (outside[:10], len(status)))
+
+    todo = [(row, filename) for row, filename in zip(rows, files)
+            if status[row] != _MERGE_DONE]
+    read = partial(_read_run, skiprows=skiprows)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(todo), _MERGE_BATCH):
+            batch = todo[start:start + _MERGE_BATCH]
+            for (row, _), values in zip(batch, pool.map(
+                    read, [filename for _, filename in batch])):
+                if output is None and values is not None:
+                    # the first readable file gives the number of outputs
+                    output = np.lib.format.open_memmap(
+                        results, mode='w+', dtype=np.float64,
+                        shape=(len(status), values.size))
+                    output[:] = np.nan
+                if values is None or values.size != output.shape[1]:
+                    status[row] = _MERGE_FAILED
+                else:
+                    output[row] = values
+                    status[row] = _MERGE_DONE
+            # checkpoint: a row is only marked merged once it is on disk
+            if output is not None:
+                output.flush()
+            np.save(status_file, status)
+
+    if output is None:
+        raise ValueError('none of the results files could be read')
+    return (output, np.flatnonzero(status == _MERGE_MISSING),
+            np.flatnonzero(status == _MERGE_FAILED))
+
+
+def normalize_negative_indices(df_list, policy='clip',
+                               epsilon=_NEGATIVE_EPSILON):
+    """
+    Deal with negative S1, ST and S2 values of one output in place and
+    return how many of each there were.
+
+    All negative values appear to be close to zero already; they are the
+    result of machine precision issues or setting n too low when
+    generating parameter sets.  To properly correct this issue you should
+    re-run your model with n greater, but sometimes that is too expensive
+    so the policies here allow display of them in a logical way.
+
+    Parameters
+    -----------
+    df_list : list
+              the [first/total order, second order] dataframes of one
+              output (the second order item may be False).
+    policy  : str, optional
+              'clip' (default) sets negative indices to `epsilon`, 'zero'
+              sets them to 0.0, 'nan' marks them as missing and 'keep'
+              leaves them alone.  With 'clip' and 'zero' the confidence
+              interval is shifted by the same amount as the index.
+    epsilon : float, optional
+              the value negative indices are set to by 'clip'.
+
+    Returns
+    --------
+    counts : dict
+             the number of negative values found for 'S1', 'ST' and 'S2'
+             (S2 is only included if there are second order indices).
+    """
+    if policy not in _NEGATIVE_POLICIES:
+        raise ValueError('policy must be one of %s'
+                         % ', '.join(_NEGATIVE_POLICIES))
+    target = {'clip': epsilon, 'zero': 0.0, 'nan': np.nan}.get(policy)
+
+    counts = {}
+    for df, header in ((df_list[0], 'S1'), (df_list[0], 'ST'),
+                       (df_list[1], 'S2')):
+        if not isinstance(df, pd.DataFrame):
+            continue
+        values = df[header].values
+        with np.errstate(invalid='ignore'):
+            negative = values < 0
+        counts[header] = int(np.count_nonzero(negative))
+        if not counts[header] or policy == 'keep':
+            continue
+        # work on writable copies of just these two columns (cached
+        # columns are read-only memory maps) and put them back
+        values = np.array(values, dtype=float)
+        conf = np.array(df[header + '_conf'].values, dtype=float)
+        if policy != 'nan':
+            # adjust confidence interval to account for shifting
+            # sensitivity value
+            conf[negative] = conf[negative] + values[negative] - target
+        values[negative] = target
+        df[header] = values
+        df[header + '_conf'] = conf
+
+    return counts
+
+
+def _load_analysis_file(filename, s2_min=None, s2_top_k=None,
+                        negatives='clip'):
+    """
+    Parse one analysis file and clean up its sensitivity indices the way
+    get_sa_data() presents them.  Returns the dataframes and the counts of
+    negative indices (see normalize_negative_indices()).  This is a module
+    level function so it can be sent to worker processes.
+    """
+    df_list = _parse_analysis_file(filename, s2_min, s2_top_k)
+    counts = normalize_negative_indices(df_list, negatives)
+
+    return df_list, counts
+
+
+def _cache_key(filename, s2_min=None, s2_top_k=None, negatives='clip'):
+    """
+    Return the name of the cache entry for an analysis file.  The key
+    changes whenever the file is moved, resized or modified, or when it is
+    loaded with different second order filters or negative index policy.
+    """
+    stat = os.stat(filename)
+    fingerprint = '%s|%s|%s|%s|%r|%r|%s' % (_CACHE_VERSION,
+                                            os.path.abspath(filename),
+                                            stat.st_size, stat.st_mtime_ns,
+                                            s2_min, s2_top_k, negatives)
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+def _write_cache(entry, filename, df_list, counts):
+    """
+    Save the dataframes for one analysis file to the cache entry directory.
+    The numerical columns of each dataframe are saved together as one 2D
+    .npy file, so a cache hit can wrap a single memory map without copying
+    it, and the parameter name columns are saved as integer codes into a
+    single vocabulary of names.  The counts of
+    negative indices are saved with them, so cached values do not need to
+    be normalized again.  The entry is written to a temporary directory
+    first so readers never see a partial entry.
+    """
+    tmp = '%s.%s.tmp' % (entry, os.getpid())
+    os.makedirs(tmp)
+    vocabulary = _share_vocabulary([df_list])
+    np.save(os.path.join(tmp, 'vocabulary.npy'),
+            np.asarray(vocabulary, dtype=str))
+    layout = []
+    for i, df in enumerate(df_list):
+        if not isinstance(df, pd.DataFrame):
+            layout.append(None)
+            continue
+        layout.append(list(df.columns))
+        numeric = [col for col in df.columns
+                   if not col.startswith('Parameter')]
+        np.save(os.path.join(tmp, '%i-values.npy' % i),
+                np.ascontiguousarray(df[numeric].to_numpy(dtype=np.float64)))
+        for col in df.columns:
+            if col.startswith('Parameter'):
+                codes = df[col].cat.codes.values
+                np.save(os.path.join(tmp, '%i-%s.codes.npy' % (i, col)),
+                        codes.astype(np.int32))
+    with open(os.path.join(tmp, 'columns.json'), 'w') as columns:
+        json.dump(layout, columns)
+    with open(os.path.join(tmp, 'negatives.json'), 'w') as negatives:
+        json.dump(counts, negatives)
+    with open(os.path.join(tmp, 'source.txt'), 'w') as source:
+        source.write(os.path.abspath(filename))
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # another process already cached this file
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _read_cache(entry):
+    """
+    Load the dataframes and counts of negative indices saved in a cache
+    entry.  The numerical columns of each dataframe are a read-only view of
+    one memory-mapped array rather than being read into memory, so they
+    can not be assigned to without copying them.
+    """
+    vocabulary = pd.Index(np.load(os.path.join(entry, 'vocabulary.npy'))
+                          .astype(object))
+    with open(os.path.join(entry, 'columns.json')) as columns:
+        layout = json.load(columns)
+    df_list = []
+    for i, columns in enumerate(layout):
+        if columns is None:
+            df_list.append(False)
+            continue
+        values = np.load(os.path.join(entry, '%i-values.npy' % i),
+                         mmap_mode='r')
+        df = pd.DataFrame(values, copy=False, columns=[
+            col for col in columns if not col.startswith('Parameter')])
+        # inserting the name columns adds blocks without copying the
+        # memory-mapped one
+        for position, col in enumerate(columns):
+            if col.startswith('Parameter'):
+                codes = np.load(os.path.join(entry, '%i-%s.codes.npy'
+                                             % (i, col)))
+                df.insert(position, col, pd.Categorical.from_codes(
+                    codes, categories=vocabulary))
+        df_list.append(df)
+    with open(os.path.join(entry, 'negatives.json')) as negatives:
+        counts = json.load(negatives)
+    # mark this entry as recently used for the eviction policy
+    os.utime(entry, None)
+
+    return df_list, counts
+
+
+def _load_cached_analysis_file(filename, cache_dir, s2_min=None,
+                               s2_top_k=None, negatives='clip'):
+    """
+    Return the processed dataframes and counts of negative indices for an
+    analysis file from the cache in `cache_dir`, parsing the file and
+    adding it to the cache on a miss.
+    """
+    entry = os.path.join(cache_dir, _cache_key(filename, s2_min, s2_top_k,
+                                               negatives))
+    if os.path.isdir(entry):
+        return _read_cache(entry)
+
+    df_list, counts = _load_analysis_file(filename, s2_min, s2_top_k,
+                                          negatives)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    _write_cache(entry, filename, df_list, counts)
+    return df_list, counts
+
+
+def _cache_entries(cache_dir):
+    """Return the cache entry directories in `cache_dir`."""
+    if not os.path.isdir(cache_dir):
+        return []
+    return [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+            if os.path.isfile(os.path.join(cache_dir, name, 'source.txt'))]
+
+
+def clear_sa_cache(cache_dir, path=None):
+    """
+    Remove parsed sensitivity analysis results from a cache directory that
+    was passed to get_sa_data().
+
+    Parameters
+    -----------
+    cache_dir : str
+                the cache directory.
+    path      : str, optional
+                only remove the entries for analysis files in this
+                directory (default is to empty the whole cache).
+
+    Returns
+    --------
+    removed : int
+              the number of cache entries that were removed.
+    """
+    removed = 0
+    for entry in _cache_entries(cache_dir):
+        if path is not None:
+            with open(os.path.join(entry, 'source.txt')) as source:
+                if (os.path.dirname(source.read()) !=
+                        os.path.abspath(path).rstrip(os.sep)):
+                    continue
+        shutil.rmtree(entry, ignore_errors=True)
+        removed += 1
+
+    return removed
+
+
+def evict_sa_cache(cache_dir, max_bytes):
+    """
+    Shrink a cache directory that was passed to get_sa_data() to at most
+    `max_bytes` by removing the least recently used entries first.
+
+    Parameters
+    -----------
+    cache_dir : str
+                the cache directory.
+    max_bytes : int
+                the maximum total size of the cache in bytes.
+
+    Returns
+    --------
+    removed : int
+              the number of cache entries that were removed.
+    """
+    entries = []
+    total = 0
+    for entry in _cache_entries(cache_dir):
+        size = sum(os.path.getsize(os.path.join(entry, name))
+                   for name in os.listdir(entry))
+        entries.append((os.path.getmtime(entry), size, entry))
+        total += size
+
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def _analysis_filenames(path):
+    """
+    Return the sorted names of the sensitivity analysis files in `path`.
+    """
+    filenames = [filename for filename in os.listdir(
+                 path) if filename.startswith('analysis')]
+
+    # These two functional groups are not present in the light oil fraction
+    for filename in list(filenames):
+        if _output_name(filename) in ('light_aromatic-C-C',
+                                      'light_aromatic-methoxyl'):
+            filenames.remove(filename)
+
+    # Sort so the output measures are always in the same order, regardless
+    # of the order the files are listed in or finish loading.
+    filenames.sort()
+
+    return filenames
+
+
+def _output_name(filename):
+    """Return the output measure name for an analysis file."""
+    for suffix in _COMPRESSED_SUFFIXES:
+        if filename.endswith(suffix):
+            filename = filename[:-len(suffix)]
+    return filename[9:].replace('.txt', '')
+
+
+def _load_sa_output(filename, cache_dir=None, s2_min=None, s2_top_k=None,
+                    negatives='clip'):
+    """
+    Load the dataframes and counts of negative indices for one analysis
+    file for get_sa_data(), from the cache if one is used.
+    """
+    if negatives not in _NEGATIVE_POLICIES:
+        raise ValueError('negatives must be one of %s'
+                         % ', '.join(_NEGATIVE_POLICIES))
+    if cache_dir is None:
+        return _load_analysis_file(filename, s2_min, s2_top_k, negatives)
+    else:
+        return _load_cached_analysis_file(filename, cache_dir, s2_min,
+                                          s2_top_k, negatives)
+
+
+def _load_sa_outputs(filenames, workers=None, executor='process',
+                     cache_dir=None, s2_min=None, s2_top_k=None,
+                     negatives='clip'):
+    """
+    Load the dataframes for a list of analysis files, in a pool of
+    `workers` processes or threads if workers > 1.  Returns the list of
+    dataframe lists and the list of counts of negative indices.
+    """
+    # check the executor even when no pool is used, so a typo is not
+    # only noticed once workers > 1
+    if executor not in _EXECUTORS:
+        raise ValueError('executor must be process or thread')
+    load = partial(_load_sa_output, cache_dir=cache_dir, s2_min=s2_min,
+                   s2_top_k=s2_top_k, negatives=negatives)
+
+    if workers is not None and workers > 1:
+        if executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        with pool:
+            loaded = list(pool.map(load, filenames))
+    else:
+        loaded = [load(filename) for filename in filenames]
+
+    return ([df_list for df_list, _ in loaded],
+            [counts for _, counts in loaded])
 
 
-def get_sa_data(path='.'):
+def get_sa_data(path='.', workers=None, executor='process', cache_dir=None,
+                cache_size=None, s2_matrix=False, s2_min=None, s2_top_k=None,
+                negatives='clip', neg_counts=None):
     """
     This function reads and processes all the sensitivity analysis results
     in a specified folder and returns a dictionary with the corresponding
@@ -175,24 +1206,68 @@ def get_sa_data(path='.'):
     indices (if present).
 
     Sensitivity analysis results should be in the default SALib output
-    format and must start with the word 'analysis'.
+    format and must start with the word 'analysis'.  Files compressed with
+    gzip (.gz), xz (.xz) or zstandard (.zst, needs the zstandard package)
+    are decompressed while they are parsed.
 
-    NOTE: there are two lines of code at the beginning of this function
-    (the filenames.remove lines) that are specific to our lignin modeling
+    NOTE: there are two lines of code in _analysis_filenames() (the
+    filenames.remove lines) that are specific to our lignin modeling
     dataset.  Future users can remove or modify these lines to use
     with other datasets.
 
     Parameters
     -----------
-    path : str, optional
-           String containing the relative or absolute path of the directory
-           where analysis_*.txt files are stored.  There cannot be any
-           files or folders within this directory that start with 'analysis'
-           except those generated by the SALib sensitivity analysis.  All
-           `analysis*` files in this path should correspond to outputs from
-           one sensitivity analysis project, and if second order sensitivity
-           indices are included in any of the files they should be present in
-           all the others.
+    path       : str, optional
+                 String containing the relative or absolute path of the
+                 directory where analysis_*.txt files are stored.  There cannot
+                 be any files or folders within this directory that start with
+                 'analysis' except those generated by the SALib sensitivity
+                 analysis.  All `analysis*` files in this path should
+                 correspond to outputs from one sensitivity analysis project,
+                 and if second order sensitivity indices are included in any of
+                 the files they should be present in all the others.
+    workers    : int, optional
+                 number of analysis files to parse concurrently.  By default
+                 (None) the files are parsed one at a time.  Compressed files
+                 are decompressed in the workers, so this also decompresses
+                 several files in parallel.
+    executor   : str, optional
+                 the kind of pool used when workers > 1, 'process' (default)
+                 or 'thread'.
+    cache_dir  : str, optional
+                 a directory where the parsed results are cached in a binary
+                 format.  Files that have not changed since they were cached
+                 (same path, size and modification time) are memory-mapped
+                 from the cache instead of being parsed again.  The
+                 numerical columns of dataframes loaded from the cache are
+                 read-only views of the cache files, so take a copy
+                 (df.copy()) before assigning to them.  Use
+                 clear_sa_cache() to invalidate the cache.
+    cache_size : int, optional
+                 if given, the cache is shrunk to at most this many bytes
+                 after loading by removing the least recently used entries
+                 (see evict_sa_cache()).
+    s2_matrix  : bool, optional
+                 if True the second order indices are returned as a
+                 SecondOrderMatrix instead of a dataframe.
+    s2_min     : float, optional
+                 only keep the pairs of parameters with a second order
+                 index (as written by SALib) of at least s2_min.  The
+                 second order block is read in chunks and other pairs are
+                 discarded while reading.
+    s2_top_k   : int, optional
+                 only keep the s2_top_k pairs of parameters with the
+                 highest second order indices (after applying s2_min).
+    negatives  : str, optional
+                 how negative S1, ST and S2 values are handled: 'clip'
+                 (default) sets them to 0.0001, 'zero' to 0.0, 'nan' marks
+                 them as missing and 'keep' leaves them alone (see
+                 normalize_negative_indices()).  Cached results are stored
+                 already normalized.
+    neg_counts : dict, optional
+                 if given, the number of negative S1, ST and S2 values of
+                 each output is stored in it, e.g.
+                 neg_counts['key'] = {'S1': 2, 'ST': 0, 'S2': 310}.
 
     Returns
     --------
@@ -206,82 +1281,678 @@ def get_sa_data(path='.'):
                order indices of all the parameters with respect to the "key"
                output variable.
 
-               sens_dfs['key'][1] is a dataframe with the second order
-               indices for pairs of parameters (if second order indices are
-               present in the analysis file).  If there are no second order
-               results in the analysis file then this value is a boolean,
-               False.
+               sens_dfs['key'][1] is a dataframe (or a SecondOrderMatrix if
+               s2_matrix is True) with the second order indices for pairs of
+               parameters (if second order indices are present in the
+               analysis file).  If there are no second order results in the
+               analysis file then this value is a boolean, False.
+
+               The Parameter, Parameter_1 and Parameter_2 columns of all the
+               dataframes are categoricals that share one vocabulary of
+               parameter names.
     """
 
-    filenames = [filename for filename in os.listdir(
-                 path) if filename.startswith('analysis')]
-
-    # These two functional groups are not present in the light oil fraction
-    if 'analysis_light_aromatic-C-C.txt' in filenames:
-        filenames.remove('analysis_light_aromatic-C-C.txt')
-    if 'analysis_light_aromatic-methoxyl.txt' in filenames:
-        filenames.remove('analysis_light_aromatic-methoxyl.txt')
+    filenames = _analysis_filenames(path)
+    df_lists, counts = _load_sa_outputs(
+        [path + filename for filename in filenames], workers, executor,
+        cache_dir, s2_min, s2_top_k, negatives)
+    if neg_counts is not None:
+        neg_counts.update(zip(map(_output_name, filenames), counts))
 
     # Make a dictionary where keys are the different output measures
     # (one for each analysis file) and values are lists of dataframes
     # with the first/total analysis results, and the second order results.
+    _share_vocabulary(df_lists)
     sens_dfs = {}
-    for filename in filenames:
-        name = filename[9:].replace('.txt', '')
-
-        with open(path + filename) as result:
-            contents = []
-            contents.append(result.readlines())
-            # find the line number in the file where 2nd order results appear
-            for j, line in enumerate(contents[0]):
-                # End this loop when you reach the line that separates
-                # the first/total indices from the second order indices
-                if line.startswith('\n'):
-                    break
-                # If no second order indices in file
-                else:
-                    j = False
-            # If there are second order indices in the file
-            if j:
-                sens_dfs[name] = [pd.read_csv(path + filename, sep=' ',
-                                              nrows=(j - 1)),
-                                  pd.read_csv(path + filename, sep=' ',
-                                              skiprows=j)
-                                  ]
-            else:
-                sens_dfs[name] = [pd.read_csv(path + filename, sep=' '),
-                                  False]
-
-        # Deal with negative values.  All negative values appear to be close
-        # to zero already; they are the result of machine precision issues or
-        # setting n too low when generating parameter sets.  To properly
-        # correct this issue you should re-run your model with n greater,
-        # but sometimes that is too expensive so this is a hack to allow
-        # display of them in a logical way.
-        # .
-        # adjust confidence interval to account for shifting sensitivity value
-        sens_dfs[name][0].loc[sens_dfs[name][0]['S1'] < 0, 'S1_conf'] = (
-            sens_dfs[name][0]['S1_conf'] + sens_dfs[name][0]['S1'] - 0.0001)
-        # set the new sensitivity value = 0.0001
-        sens_dfs[name][0].loc[sens_dfs[name][0]['S1'] < 0, 'S1'] = 0.0001
-        # do the same for total and second order indices
-        sens_dfs[name][0].loc[sens_dfs[name][0]['ST'] < 0, 'ST_conf'] = (
-            sens_dfs[name][0]['ST_conf'] + sens_dfs[name][0]['ST'] - 0.0001)
-        sens_dfs[name][0].loc[sens_dfs[name][0]['ST'] < 0, 'ST'] = 0.0001
-        if isinstance(sens_dfs[name][1], pd.DataFrame):
-            sens_dfs[name][1].loc[sens_dfs[name][1]['S2'] < 0, 'S2_conf'] = (
-                sens_dfs[name][1]['S2_conf'] + sens_dfs[name][1]['S2'] -
-                0.0001)
-            sens_dfs[name][1].loc[sens_dfs[name][1]['S2'] < 0, 'S2'] = 0.0001
-
-        # Change 'rxn' to 'k' for consistency with inputs file
-        sens_dfs[name][0].Parameter = (sens_dfs[name][0].Parameter
-                                       .str.replace('rxn', 'k', case=False))
+    for filename, df_list in zip(filenames, df_lists):
+        if s2_matrix and isinstance(df_list[1], pd.DataFrame):
+            df_list[1] = SecondOrderMatrix.from_dataframe(df_list[1])
+        sens_dfs[_output_name(filename)] = df_list
+
+    if cache_dir is not None and cache_size is not None:
+        evict_sa_cache(cache_dir, cache_size)
 
     return sens_dfs
 
 
-def find_unimportant_params(header='ST', path='.'):
+def _fingerprint(filename):
+    """
+    Return the (size, modification time) of a file, which changes when an
+    analysis is re-run, or None if the file has been removed.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _sa_vocabulary(sa_dict):
+    """Return the vocabulary of parameter names shared by an sa_dict."""
+    for df_list in sa_dict.values():
+        if hasattr(df_list[0]['Parameter'], 'cat'):
+            return df_list[0]['Parameter'].cat.categories
+    return pd.Index([])
+
+
+def refresh_sa_data(sa_dict, fingerprints, path='.', workers=None,
+                    executor='process', cache_dir=None, s2_matrix=False,
+                    s2_min=None, s2_top_k=None, negatives='clip',
+                    neg_counts=None):
+    """
+    Bring a dictionary of sensitivity analysis results up to date with the
+    analysis files in `path`, parsing only the files that were added or
+    modified since the last refresh and dropping the outputs whose files
+    were deleted.  `sa_dict` and `fingerprints` are updated in place.
+
+    Start with an empty sa_dict and fingerprints dictionary (the first
+    refresh then loads every file, like get_sa_data()) and pass the same
+    two dictionaries to every later refresh.  An output is reloaded when
+    the size or modification time of its file changes.
+
+    Parameters
+    -----------
+    sa_dict      : dict
+                   the dictionary of results to update (see get_sa_data()).
+    fingerprints : dict
+                   a dictionary where refresh_sa_data() keeps the size and
+                   modification time of the file of each output in sa_dict.
+    path         : str, optional
+                   the directory where the analysis_*.txt files are stored.
+    workers      : int, optional
+                   number of analysis files to parse concurrently.
+    executor     : str, optional
+                   the kind of pool used when workers > 1, 'process'
+                   (default) or 'thread'.
+    cache_dir    : str, optional
+                   a cache directory for the parsed results (see
+                   get_sa_data(), results from the cache are read-only).
+    s2_matrix    : bool, optional
+                   if True the second order indices are stored as a
+                   SecondOrderMatrix instead of a dataframe.
+    s2_min       : float, optional
+                   only keep second order indices of at least s2_min.
+    s2_top_k     : int, optional
+                   only keep the s2_top_k highest second order indices.
+    negatives    : str, optional
+                   how negative indices are handled ('clip', 'zero', 'keep'
+                   or 'nan').
+    neg_counts   : dict, optional
+                   if given, the counts of negative indices of the changed
+                   outputs are stored in it and removed outputs are dropped.
+
+    The loading options (workers to neg_counts) are the same as for
+    get_sa_data() and should not change between refreshes of one sa_dict.
+
+    Returns
+    --------
+    changed : list
+              the names of the outputs that were added or reloaded.
+    removed : list
+              the names of the outputs that were dropped from sa_dict.
+    """
+    if executor not in _EXECUTORS:
+        raise ValueError('executor must be process or thread')
+    filenames = dict((_output_name(filename), filename)
+                     for filename in _analysis_filenames(path))
+    current = dict((name, _fingerprint(path + filename))
+                   for name, filename in filenames.items())
+
+    removed = sorted(name for name in set(sa_dict) | set(fingerprints)
+                     if current.get(name) is None)
+    for name in removed:
+        sa_dict.pop(name, None)
+        fingerprints.pop(name, None)
+        if neg_counts is not None:
+            neg_counts.pop(name, None)
+
+    changed = sorted(name for name, fingerprint in current.items()
+                     if fingerprint is not None and
+                     (name not in sa_dict or
+                      fingerprints.get(name) != fingerprint))
+    if not changed:
+        return changed, removed
+
+    df_lists, counts = _load_sa_outputs(
+        [path + filenames[name] for name in changed], workers, executor,
+        cache_dir, s2_min, s2_top_k, negatives)
+    if neg_counts is not None:
+        neg_counts.update(zip(changed, counts))
+
+    unchanged = [df_list for name, df_list in sa_dict.items()
+                 if name not in changed]
+    vocabulary = _sa_vocabulary(sa_dict)
+    num_names = len(vocabulary)
+    vocabulary = _share_vocabulary(df_lists, vocabulary)
+    if len(vocabulary) > num_names:
+        # new names were appended, give the other outputs the extended
+        # vocabulary too
+        _share_vocabulary(unchanged, vocabulary)
+
+    for name, df_list in zip(changed, df_lists):
+        if s2_matrix and isinstance(df_list[1], pd.DataFrame):
+            df_list[1] = SecondOrderMatrix.from_dataframe(df_list[1])
+        sa_dict[name] = df_list
+        fingerprints[name] = current[name]
+
+    return changed, removed
+
+
+class SADataWatcher(object):
+    """
+    Keep a dictionary of sensitivity analysis results up to date by
+    polling the directory of analysis files in a background thread and
+    calling refresh_sa_data() when files are added, modified or deleted.
+
+    Parameters
+    -----------
+    path     : str, optional
+               the directory where the analysis_*.txt files are stored.
+    interval : float, optional
+               the number of seconds between checks of the directory.
+    callback : function, optional
+               called as callback(changed, removed) from the watcher
+               thread after every refresh that changed the results (see
+               refresh_sa_data()).
+    sa_dict  : dict, optional
+               the dictionary to keep up to date (default is a new one).
+    **kwargs : keyword arguments passed to refresh_sa_data() (workers,
+               executor, cache_dir, s2_matrix, s2_min, s2_top_k, negatives
+               and neg_counts).
+
+    The results are in the `sa_dict` attribute, which is loaded when the
+    watcher is created.  Use refresh() to check the directory once, or
+    start() and stop() to poll it in the background.
+    """
+
+    def __init__(self, path='.', interval=1.0, callback=None, sa_dict=None,
+                 **kwargs):
+        self.path = path
+        self.interval = interval
+        self.callback = callback
+        self.sa_dict = sa_dict if sa_dict is not None else {}
+        self.fingerprints = {}
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Check the directory once and update sa_dict.  Returns the lists of
+        changed and removed outputs (see refresh_sa_data()).
+        """
+        with self._lock:
+            return refresh_sa_data(self.sa_dict, self.fingerprints,
+                                   self.path, **self._kwargs)
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            changed, removed = self.refresh()
+            if (changed or removed) and self.callback is not None:
+                self.callback(changed, removed)
+
+    def start(self):
+        """Start polling the directory in a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling and wait for the background thread to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class LazySAData(Mapping):
+    """
+    A read-only dictionary of sensitivity analysis results, with the same
+    keys and values as the dictionary returned by get_sa_data(), that only
+    parses an output's analysis file the first time it is accessed.
+
+    The keys are available immediately from the directory listing.  If
+    `max_resident` is given, only that many outputs are kept in memory and
+    the least recently used output is dropped (and parsed again if it is
+    needed later).  All the outputs that are loaded share one vocabulary
+    of parameter names.
+
+    Parameters
+    -----------
+    path         : str, optional
+                   the directory where the analysis_*.txt files are stored
+                   (see get_sa_data()).
+    max_resident : int, optional
+                   the maximum number of outputs to keep in memory (default
+                   is to keep every output that has been accessed).
+    cache_dir    : str, optional
+                   a cache directory for the parsed results (see
+                   get_sa_data()).
+    s2_matrix    : bool, optional
+                   if True the second order indices are returned as a
+                   SecondOrderMatrix instead of a dataframe.
+    s2_min       : float, optional
+                   only keep second order indices of at least s2_min (see
+                   get_sa_data()).
+    s2_top_k     : int, optional
+                   only keep the s2_top_k highest second order indices (see
+                   get_sa_data()).
+    negatives    : str, optional
+                   how negative indices are handled ('clip', 'zero', 'keep'
+                   or 'nan', see get_sa_data()).  The counts of negative
+                   indices of the outputs that have been loaded are kept in
+                   the `neg_counts` attribute.
+    """
+
+    def __init__(self, path='.', max_resident=None, cache_dir=None,
+                 s2_matrix=False, s2_min=None, s2_top_k=None,
+                 negatives='clip'):
+        self.path = path
+        self.max_resident = max_resident
+        self.cache_dir = cache_dir
+        self.s2_matrix = s2_matrix
+        self.s2_min = s2_min
+        self.s2_top_k = s2_top_k
+        self.negatives = negatives
+        self.neg_counts = {}
+        self.vocabulary = pd.Index([])
+        self._filenames = OrderedDict(
+            (_output_name(filename), filename)
+            for filename in _analysis_filenames(path))
+        self._resident = OrderedDict()
+
+    def __getitem__(self, key):
+        if key in self._resident:
+            self._resident.move_to_end(key)
+            return self._resident[key]
+
+        df_list, self.neg_counts[key] = _load_sa_output(
+            self.path + self._filenames[key], self.cache_dir, self.s2_min,
+            self.s2_top_k, self.negatives)
+        num_names = len(self.vocabulary)
+        self.vocabulary = _share_vocabulary([df_list], self.vocabulary)
+        if len(self.vocabulary) > num_names:
+            # new names were appended, give the resident outputs the
+            # extended vocabulary too
+            _share_vocabulary(self._resident.values(), self.vocabulary)
+        if self.s2_matrix and isinstance(df_list[1], pd.DataFrame):
+            df_list[1] = SecondOrderMatrix.from_dataframe(df_list[1])
+
+        self._resident[key] = df_list
+        if self.max_resident is not None:
+            while len(self._resident) > max(self.max_resident, 1):
+                self._resident.popitem(last=False)
+
+        return df_list
+
+    def __iter__(self):
+        return iter(self._filenames)
+
+    def __len__(self):
+        return len(self._filenames)
+
+    def loaded_keys(self):
+        """Return the keys of the outputs currently held in memory."""
+        return list(self._resident)
+
+
+def _store_vocabulary(sa_dict):
+    """
+    Return one vocabulary with every parameter name used in an sa_dict,
+    starting with the vocabulary the dataframes already share.
+    """
+    vocabulary = _sa_vocabulary(sa_dict)
+    names = [np.asarray(vocabulary, dtype=object)]
+    for df_list in sa_dict.values():
+        for item in df_list:
+            if isinstance(item, SecondOrderMatrix):
+                names.append(np.asarray(item.names, dtype=object))
+            elif isinstance(item, pd.DataFrame):
+                for col in item.columns:
+                    if not col.startswith('Parameter'):
+                        continue
+                    if (hasattr(item[col], 'cat') and
+                            item[col].cat.categories.equals(vocabulary)):
+                        continue
+                    names.append(np.asarray(pd.unique(item[col]),
+                                            dtype=object))
+    return pd.Index(pd.unique(np.concatenate(names)))
+
+
+def _name_codes(names, vocabulary):
+    """Return the int32 codes of `names` in `vocabulary`."""
+    if hasattr(names, 'cat') and names.cat.categories.equals(vocabulary):
+        return names.cat.codes.values.astype(np.int32)
+    return vocabulary.get_indexer(np.asarray(names, dtype=object)).astype(
+        np.int32)
+
+
+def _store_data_start(header_length):
+    """Return where the arrays start in a store with a header this long."""
+    end = len(_STORE_MAGIC) + 1 + 8 + header_length
+    return -(-end // _STORE_ALIGN) * _STORE_ALIGN
+
+
+def export_sa_data(sa_dict, filename):
+    """
+    Write a whole dictionary of sensitivity analysis results into one
+    binary file that can be copied as a single file and read back with
+    import_sa_data() or SAStore.
+
+    The file starts with a short JSON index (the shared vocabulary of
+    parameter names and the position, dtype and shape of every array)
+    followed by the arrays themselves, so one output can be read by
+    seeking straight to its arrays.  Parameter names are stored as int32
+    codes into the vocabulary.
+
+    Parameters
+    -----------
+    sa_dict  : dict
+               the sensitivity analysis results (from get_sa_data(),
+               format_salib_outputs() or LazySAData).  The second order
+               indices may be dataframes or SecondOrderMatrix objects.
+    filename : str
+               the file to write.  It is written under a temporary name
+               and renamed, so readers never see a partly written file.
+
+    Returns
+    --------
+    None
+    """
+    vocabulary = _store_vocabulary(sa_dict)
+    arrays = []
+    size = [0]
+
+    def add(array):
+        # record where an array goes, relative to the start of the arrays
+        array = np.ascontiguousarray(array)
+        offset = -(-size[0] // _STORE_ALIGN) * _STORE_ALIGN
+        size[0] = offset + array.nbytes
+        arrays.append((offset, array))
+        return {'offset': offset, 'dtype': array.dtype.str,
+                'shape': list(array.shape)}
+
+    def add_frame(df):
+        columns = []
+        for col in df.columns:
+            if col.startswith('Parameter'):
+                entry = add(_name_codes(df[col], vocabulary))
+                entry['names'] = True
+            else:
+                entry = add(df[col].values)
+            entry['name'] = col
+            columns.append(entry)
+        return {'kind': 'frame', 'columns': columns}
+
+    outputs = []
+    for key, df_list in sa_dict.items():
+        second = df_list[1]
+        if isinstance(second, SecondOrderMatrix):
+            second = {'kind': 'matrix',
+                      'names': add(_name_codes(second.names, vocabulary)),
+                      's2': add(second.s2), 's2_conf': add(second.s2_conf)}
+        elif isinstance(second, pd.DataFrame):
+            second = add_frame(second)
+        else:
+            second = None
+        outputs.append({'key': key, 'first': add_frame(df_list[0]),
+                        'second': second})
+
+    header = json.dumps({'version': _STORE_VERSION,
+                         'vocabulary': [str(name) for name in vocabulary],
+                         'outputs': outputs}).encode('utf-8')
+    start = _store_data_start(len(header))
+
+    tmp = '%s.tmp%d' % (filename, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(_STORE_MAGIC + bytes([_STORE_VERSION]))
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for offset, array in arrays:
+            f.seek(start + offset)
+            f.write(array.tobytes())
+        f.truncate(start + size[0])
+    os.replace(tmp, filename)
+
+
+class SAStore(Mapping):
+    """
+    A read-only dictionary of the sensitivity analysis results in a file
+    written by export_sa_data().  Only the index at the start of the file
+    is read when the store is opened; each output is read from its own
+    part of the file when it is accessed, and is not kept in memory by
+    the store.
+
+    Parameters
+    -----------
+    filename  : str
+                the file written by export_sa_data().
+    mmap_mode : str, optional
+                if given (e.g. 'r'), the arrays are memory-mapped from the
+                file instead of read into memory; this matters most for
+                SecondOrderMatrix arrays, which are used as they are.
+    s2_matrix : bool, optional
+                if True the second order indices are returned as a
+                SecondOrderMatrix even if they were stored as a dataframe.
+    """
+
+    def __init__(self, filename, mmap_mode=None, s2_matrix=False):
+        self.filename = filename
+        self.mmap_mode = mmap_mode
+        self.s2_matrix = s2_matrix
+        with open(filename, 'rb') as f:
+            if (f.read(len(_STORE_MAGIC) + 1) !=
+                    _STORE_MAGIC + bytes([_STORE_VERSION])):
+                raise ValueError('%s is not a file written by '
+                                 'export_sa_data()' % filename)
+            length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(length).decode('utf-8'))
+        self._start = _store_data_start(length)
+        self.vocabulary = pd.Index(header['vocabulary'], dtype=object)
+        self._dtype = pd.api.types.CategoricalDtype(self.vocabulary)
+        self._outputs = OrderedDict((output['key'], output)
+                                    for output in header['outputs'])
+
+    def _array(self, f, entry):
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        if self.mmap_mode is not None and int(np.prod(shape)) > 0:
+            return np.memmap(self.filename, dtype=dtype, mode=self.mmap_mode,
+                             offset=self._start + entry['offset'],
+                             shape=shape)
+        f.seek(self._start + entry['offset'])
+        return np.fromfile(f, dtype=dtype,
+                           count=int(np.prod(shape))).reshape(shape)
+
+    def _frame(self, f, entry):
+        columns = OrderedDict()
+        for column in entry['columns']:
+            values = self._array(f, column)
+            if column.get('names'):
+                values = pd.Categorical.from_codes(values, dtype=self._dtype)
+            columns[column['name']] = values
+        return pd.DataFrame(columns, columns=list(columns))
+
+    def __getitem__(self, key):
+        output = self._outputs[key]
+        with open(self.filename, 'rb') as f:
+            df_list = [self._frame(f, output['first']), False]
+            second = output['second']
+            if second is None:
+                return df_list
+            if second['kind'] == 'matrix':
+                names = self.vocabulary[self._array(f, second['names'])]
+                df_list[1] = SecondOrderMatrix(
+                    names, self._array(f, second['s2']),
+                    self._array(f, second['s2_conf']))
+            else:
+                df_list[1] = self._frame(f, second)
+                if self.s2_matrix:
+                    df_list[1] = SecondOrderMatrix.from_dataframe(df_list[1])
+        return df_list
+
+    def __iter__(self):
+        return iter(self._outputs)
+
+    def __len__(self):
+        return len(self._outputs)
+
+
+def import_sa_data(filename, keys=None, mmap_mode=None, s2_matrix=False):
+    """
+    Read sensitivity analysis results from a file written by
+    export_sa_data() into a dictionary like the one get_sa_data() returns.
+
+    Parameters
+    -----------
+    filename  : str
+                the file written by export_sa_data().
+    keys      : list, optional
+                the output measures to read (default is all of them).  The
+                other outputs are skipped without reading them.
+    mmap_mode : str, optional
+                memory-map the arrays instead of reading them (see SAStore).
+    s2_matrix : bool, optional
+                if True the second order indices are returned as a
+                SecondOrderMatrix.
+
+    Returns
+    --------
+    sa_dict : dict
+              the sensitivity analysis results; the parameter name columns
+              are categoricals sharing the vocabulary stored in the file.
+    """
+    store = SAStore(filename, mmap_mode, s2_matrix)
+    if keys is None:
+        keys = list(store)
+    return dict((key, store[key]) for key in keys)
+
+
+class SensitivityTensor(object):
+    """
+    First and total order sensitivity indices of every output measure,
+    aligned in (n_params, n_outputs) arrays so that questions about all
+    the outputs are answered with vectorized reductions.  Use
+    combine_sens() to build one from a dictionary of results.
+
+    Parameters
+    -----------
+    params  : pandas Index
+              the parameter names (rows of the arrays).
+    outputs : list
+              the output measure names (columns of the arrays).
+    indices : dict
+              dictionary with the arrays for 'S1', 'S1_conf', 'ST' and
+              'ST_conf'.  A parameter that is missing from an output is NaN.
+    """
+
+    def __init__(self, params, outputs, indices):
+        self.params = pd.Index(params)
+        self.outputs = list(outputs)
+        self.indices = indices
+
+    def __getitem__(self, header):
+        return self.indices[header]
+
+    def to_dataframe(self, header='ST'):
+        """
+        Return a dataframe of one index (S1, S1_conf, ST or ST_conf) with a
+        row for each parameter and a column for each output measure.
+        """
+        return pd.DataFrame(self.indices[header], index=self.params,
+                            columns=self.outputs)
+
+    def zero_for_all(self, header='ST'):
+        """
+        Return a sorted list of the parameters whose `header` index and
+        confidence interval are exactly 0.0 for every output.
+        """
+        zero = ((self.indices[header] == 0.0) &
+                (self.indices['%s_conf' % header] == 0.0)).all(axis=1)
+        return sorted(self.params[zero])
+
+    def max(self, header='ST'):
+        """Return a Series with the largest index of each parameter across
+        all the outputs."""
+        with np.errstate(invalid='ignore'):
+            return pd.Series(np.nanmax(self.indices[header], axis=1),
+                             index=self.params)
+
+    def ranks(self, header='ST'):
+        """
+        Return an (n_params, n_outputs) array with the rank of each
+        parameter within each output (0 is the most sensitive parameter).
+        """
+        values = np.where(np.isnan(self.indices[header]), -np.inf,
+                          self.indices[header])
+        order = np.argsort(-values, axis=0, kind='mergesort')
+        ranks = np.empty_like(order)
+        ranks[order, np.arange(values.shape[1])] = np.arange(
+            values.shape[0])[:, None]
+        return ranks
+
+    def top_outputs(self, param, top=10, header='ST'):
+        """Return the outputs where `param` is one of the `top` most
+        sensitive parameters."""
+        ranks = self.ranks(header)[self.params.get_loc(param)]
+        return [output for output, rank in zip(self.outputs, ranks)
+                if rank < top]
+
+
+def combine_sens(sa_dict):
+    """
+    This function combines the first and total order sensitivity indices
+    and confidence values from every output measure into arrays where each
+    row is a parameter and each column is an output measure.
+
+    The result can be used to plot or query the sensitivity indices of all
+    of the output measures for a given input parameter.
+
+    Parameters
+    -----------
+    sa_dict : dict
+              a dictionary with all the sensitivity analysis results (from
+              get_sa_data() or LazySAData).
+
+    Returns
+    --------
+    tensor : SensitivityTensor
+             the aligned (n_params, n_outputs) arrays of S1, S1_conf, ST
+             and ST_conf.
+    """
+    headers = ['S1', 'S1_conf', 'ST', 'ST_conf']
+    outputs = list(sa_dict.keys())
+    params = pd.Index([])
+    indices = dict((header, np.empty((0, len(outputs)))) for header in headers)
+
+    for j, output in enumerate(outputs):
+        df = sa_dict[output][0]
+        names = df['Parameter']
+        if hasattr(names, 'cat'):
+            categories, codes = names.cat.categories, names.cat.codes.values
+        else:
+            codes, categories = pd.factorize(names.values)
+        # grow the rows when an output has parameters we haven't seen yet
+        new = categories[params.get_indexer(categories) < 0]
+        if len(new):
+            params = params.append(new)
+            for header in headers:
+                indices[header] = np.vstack((indices[header],
+                                             np.full((len(new), len(outputs)),
+                                                     np.nan)))
+        rows = params.get_indexer(categories)[codes]
+        for header in headers:
+            indices[header][rows, j] = df[header].values
+
+    return SensitivityTensor(params, outputs, indices)
+
+
+def find_unimportant_params(header='ST', path='.', sa_dict=None):
     """
     This function finds which parameters have sensitivities and confidence
     intervals equal to exactly 0.0, which means those parameters have no
@@ -294,11 +1965,16 @@ def find_unimportant_params(header='ST', path='.'):
 
     Parameters
     -----------
-    header : str, optional
-             string of the column header for the sensitivity index you choose.
-    path   : str, optional
-             string with the path to the folder where your analysis files
-             are located.
+    header  : str, optional
+              string of the column header for the sensitivity index you
+              choose.
+    path    : str, optional
+              string with the path to the folder where your analysis files
+              are located.
+    sa_dict : dict, optional
+              sensitivity analysis results that are already loaded (from
+              get_sa_data() or LazySAData).  If given, `path` is not read
+              again.
 
     Returns
     --------
@@ -309,43 +1985,10 @@ def find_unimportant_params(header='ST', path='.'):
     if header not in set(['ST', 'S1']):
         raise ValueError('header must be ST or S1')
 
-    zero_params = []
-    sa_dict = get_sa_data(path)
-    for key in sa_dict.keys():
-        df = sa_dict[key][0]
-        zero_params.append(df[(df[header] == 0.0) &
-                              (df['%s_conf' % header] == 0.0)]
-                           .loc[:, 'Parameter'].values.tolist())
-
-    result = set(zero_params[0])
-    for s in zero_params[1:]:
-        result.intersection_update(s)
-    unimportant = list(result)
-    unimportant.sort()
+    if sa_dict is None:
+        sa_dict = get_sa_data(path)
+    unimportant = combine_sens(sa_dict).zero_for_all(header)
 
     print('The following %s parameters have %s==0 for all outputs:\n' % \
           (len(unimportant), header), unimportant, '\n')
     return unimportant
-
-
-# THIS IS A FUNCTION THAT MIGHT BE USEFUL IN THE FUTURE
-# BUT I HAVEN'T WRITTEN YET.
-# def combine_sens(order):
-#     """
-#     STILL WORKING ON WRITING THIS FUNCTION
-#
-#     This function creates a pandas dataframe that has all the sensitivity
-#     indices and confidence values of a specified order (first, total) from
-#     every output measure.
-#
-#     The output of this function can be used to plot the sensitivity indices
-#     of all of the output measures for a given input parameter.
-#
-#     Parameters
-#     -----------
-#     order : String indicating which order indices to combine (first, total)
-#
-#     Returns
-#     --------
-#
-#     """
@@ -39,7 +39,7 @@ def plot_all_outputs(sa_dict, demo=False, min_val=0.01, top=100, stacked=True,
     -----------
     sa_dict                : dict
                              a dictionary with all the sensitivity analysis
-                             results.
+                             results (or a data_processing.LazySAData).
     demo                   : bool, optional
                              plot only two outcomes instead of all outcomes
                              for demo purpose.
@@ -70,16 +70,14 @@ def plot_all_outputs(sa_dict, demo=False, min_val=0.01, top=100, stacked=True,
     """
 
     tabs_dictionary = {}
-    outcomes_array = []
+    outcomes = list(sa_dict.keys())
     if demo:
-        for files in sa_dict.keys()[0:2]:
-            outcomes_array.append(sa_dict[files][0])
-    else:
-        for files in sa_dict.keys():
-            outcomes_array.append(sa_dict[files][0])
-
-    for i in range(len(outcomes_array)):
-        p = make_plot(outcomes_array[i],
+        outcomes = outcomes[0:2]
+
+    # Access one output at a time so lazily loaded results (LazySAData)
+    # only need to hold the output that is being plotted
+    for i, outcome in enumerate(outcomes):
+        p = make_plot(sa_dict[outcome][0],
                       top=top,
                       minvalues=min_val,
                       stacked=stacked,
@@ -87,7 +85,7 @@ def plot_all_outputs(sa_dict, demo=False, min_val=0.01, top=100, stacked=True,
                       lgaxis=log_axis,
                       highlight=highlighted_parameters
                       )
-        tabs_dictionary[i] = Panel(child=p, title=list(sa_dict.keys())[i])
+        tabs_dictionary[i] = Panel(child=p, title=outcome)
 
     tabs = Tabs(tabs=list(tabs_dictionary.values()))
     p = show(tabs)
@@ -167,17 +165,13 @@ def plot_all_second_order(sa_dict, top=5, mirror=True, include=[]):
     """
 
     tabs_dictionary = {}
-    outcomes_array = []
-
-    for files in sa_dict.keys():
-        outcomes_array.append(sa_dict[files][1])
 
-    for i in range(len(sa_dict)):
-        p = make_second_order_heatmap(outcomes_array[i],
+    for i, outcome in enumerate(sa_dict.keys()):
+        p = make_second_order_heatmap(sa_dict[outcome][1],
                                       top=top,
                                       mirror=mirror,
                                       include=include)
-        tabs_dictionary[i] = Panel(child=p, title=list(sa_dict.keys())[i])
+        tabs_dictionary[i] = Panel(child=p, title=outcome)
 
     tabs = Tabs(tabs=list(tabs_dictionary.values()))
     p = show(tabs)
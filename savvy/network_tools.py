@@ -24,6 +24,10 @@ except ImportError:
           'use network_tools!\nOther modules in savvy are independent'
           'of graph-tool.')
 
+import numpy as np
+
+from .data_processing import SecondOrderMatrix
+
 
 def build_graph(df_list, sens='ST', top=410, min_sens=0.01,
                 edge_cutoff=0.0, edge_width=150, log=False):
@@ -39,7 +43,8 @@ def build_graph(df_list, sens='ST', top=410, min_sens=0.01,
     df_list     : list
                   A list of two dataframes.  The first dataframe should be
                   the first/total order sensitivities collected by the
-                  function data_processing.get_sa_data().
+                  function data_processing.get_sa_data().  The second
+                  order indices can be a dataframe or a SecondOrderMatrix.
     sens        : str, optional
                   A string with the name of the sensitivity that you would
                   like to use for the vertices ('ST' or 'S1').
@@ -76,11 +81,10 @@ def build_graph(df_list, sens='ST', top=410, min_sens=0.01,
     if sens not in set(['ST', 'S1']):
         raise ValueError('sens must be ST or S1')
     # Make sure that there is a second order index dataframe
-    try:
-        if not df2:
-            raise Exception('Missing second order dataframe!')
-    except:
-        pass
+    if df2 is None or df2 is False:
+        raise Exception('Missing second order dataframe!')
+    if not isinstance(df2, SecondOrderMatrix):
+        df2 = SecondOrderMatrix.from_dataframe(df2)
 
     # slice the dataframes so the resulting graph will only include the top
     # 'top' values of 'sens' greater than 'min_sens'.
@@ -116,25 +120,20 @@ def build_graph(df_list, sens='ST', top=410, min_sens=0.01,
         vprop_name[v] = param
         v_list.append(v)
 
-    # Make two new columns in second order dataframe that point to the vertices
-    # connected on each row.
-    df2['vertex1'] = -999
-    df2['vertex2'] = -999
-    for vertex in v_list:
-        param = g.vp.param[vertex]
-        df2.loc[df2['Parameter_1'] == param, 'vertex1'] = vertex
-        df2.loc[df2['Parameter_2'] == param, 'vertex2'] = vertex
-
-    # Only allow edges for vertices that we've defined
-    df_edges = df2[(df2['vertex1'] != -999) & (df2['vertex2'] != -999)]
-    # eliminate edges below a certain cutoff value
-    pruned = df_edges[df_edges['S2'] > edge_cutoff]
-    pruned.reset_index(inplace=True)
+    # Look up the rows/columns of the second order matrix for the vertices
+    # we've defined (parameters without second order indices get no edges)
+    in_matrix = [i for i, param in enumerate(df['Parameter'])
+                 if param in df2.index]
+    ids = [df2.index[df.loc[i, 'Parameter']] for i in in_matrix]
+    # Only allow edges for vertices that we've defined, and eliminate edges
+    # below a certain cutoff value (missing pairs are NaN and never pass)
+    s2 = df2.s2[np.ix_(ids, ids)]
+    with np.errstate(invalid='ignore'):
+        rows, cols = np.nonzero(s2 > edge_cutoff)
     # Add the edges for the graph
-    for i, sensitivity in enumerate(pruned['S2']):
-        v1 = pruned.loc[i, 'vertex1']
-        v2 = pruned.loc[i, 'vertex2']
-        e = g.add_edge(v1, v2)
+    for row, col in zip(rows, cols):
+        sensitivity = float(s2[row, col])
+        e = g.add_edge(v_list[in_matrix[row]], v_list[in_matrix[col]])
         # multiply by a number to make the lines visible on the plot
         eprop_sens[e] = sensitivity if sensitivity > 0 else sensitivity * -1
         # if log:
@@ -16,6 +16,8 @@ from bokeh.plotting import figure, ColumnDataSource
 from bokeh.models import HoverTool, VBar
 # from bokeh.charts import Bar
 
+from .data_processing import SecondOrderMatrix
+
 
 def make_plot(dataframe=pd.DataFrame(), highlight=[],
               top=100, minvalues=0.01, stacked=True, lgaxis=True,
@@ -83,6 +85,8 @@ def make_plot(dataframe=pd.DataFrame(), highlight=[],
     df = df.sort_values('ST', ascending=False)
     df = df.head(top)
     df = df.reset_index(drop=True)
+    # Plot the names as plain strings (they may be stored as categoricals)
+    df['Parameter'] = df['Parameter'].astype(str)
 
     # Create arrays of colors and order labels for plotting
     colors = ["#a1d99b", "#31a354", "#546775", "#225ea8"]
@@ -381,7 +385,7 @@ def make_second_order_heatmap(df, top=10, name='', mirror=True, include=[]):
 
     Parameters
     -----------
-    df     : pandas dataframe
+    df     : pandas dataframe or SecondOrderMatrix
              dataframe with second order sensitivity indices. This
              dataframe should be formatted in the standard output format
              from a Sobol sensitivity analysis in SALib.
@@ -407,9 +411,13 @@ def make_second_order_heatmap(df, top=10, name='', mirror=True, include=[]):
     """
 
     # Confirm that df contains second order sensitivity indices
-    if (list(df.columns.values).sort() !=
-            ['Parameter_1', 'Parameter_2', 'S2', 'S2_conf'].sort()):
+    if isinstance(df, SecondOrderMatrix):
+        matrix = df
+    elif not set(['Parameter_1', 'Parameter_2', 'S2',
+                  'S2_conf']).issubset(df.columns):
         raise TypeError('df must contain second order sensitivity data')
+    else:
+        matrix = SecondOrderMatrix.from_dataframe(df)
 
     # Make sure `top` != 0 (it must be at least 1, even if a list is
     # specified for `include`.
@@ -422,7 +430,7 @@ def make_second_order_heatmap(df, top=10, name='', mirror=True, include=[]):
               "#4292c6", "#2171b5", "#08519c", "#08306b"]
 
     # Slice the dataframe to include only the top parameters
-    df_top = df.sort_values('S2', ascending=False).head(top)
+    df_top = matrix.top(top)
 
     # Make a list of all the parameters that interact with each other
     labels = list(set(
@@ -434,7 +442,7 @@ def make_second_order_heatmap(df, top=10, name='', mirror=True, include=[]):
     ylabels = labels
 
     # Use this to scale the heat map so the max sensitivity index is darkest
-    maxval = np.max(df.S2)
+    maxval = matrix.max()
 
     xlabel = []
     ylabel = []
@@ -445,38 +453,18 @@ def make_second_order_heatmap(df, top=10, name='', mirror=True, include=[]):
         for py in ylabels:
             xlabel.append(px)
             ylabel.append(py)
-            # sens is a dataframe with S2 and S2_conf that is stored for
-            # each box of the heat map
-            sens = (df[df.Parameter_1.isin([px]) & df.Parameter_2.isin([py])]
-                    .loc[:, ['S2', 'S2_conf']])
-            # dfs can be empty if there are no corresponding pairs in the
-            # source dataframe (for example a parameter interacting with
-            # itself).
-            if sens.empty and not mirror:
-                s2.append(float('NaN'))
-                s2_conf.append(float('NaN'))
+            # Pairs can be missing from the matrix (for example a parameter
+            # interacting with itself).  The heat map is symmetric across
+            # the diagonal, so the mirror image is filled in from the
+            # reversed pair if you've chosen to plot it.
+            sens, sens_conf = matrix.get(px, py, mirror=mirror)
+            s2.append(sens)
+            s2_conf.append(sens_conf)
+            if np.isnan(sens):
                 color.append("#b3b3b3")
-            # This heat map is symmetric across the diagonal, so this elif
-            # statement populates the mirror image if you've chosen to
-            elif sens.empty and mirror:
-                sens_mirror = (df[df.Parameter_1.isin([py]) &
-                                  df.Parameter_2.isin([px])]
-                               .loc[:, ['S2', 'S2_conf']])
-                if sens_mirror.empty:
-                    s2.append(float('NaN'))
-                    s2_conf.append(float('NaN'))
-                    color.append("#b3b3b3")
-                else:
-                    s2.append(sens_mirror.S2.values[0])
-                    s2_conf.append(sens_mirror.S2_conf.values[0])
-                    color.append(colors[max(0, int(round((sens_mirror.S2.values[0] /
-                                                   maxval) * 7) + 1))])
-            # This else handles the standard (un-mirrored) boxes of the plot
             else:
-                s2.append(sens.S2.values[0])
-                s2_conf.append(sens.S2_conf.values[0])
-                color.append(colors[max(0, int(round((sens.S2.values[0] /
-                                               maxval) * 7) + 1))])
+                color.append(colors[max(0, int(round((sens / maxval) * 7) +
+                                                   1))])
 
     source = ColumnDataSource(data=dict(xlabel=xlabel, ylabel=ylabel, s2=s2,
                               s2_conf=s2_conf, color=color))
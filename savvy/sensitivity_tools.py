@@ -7,46 +7,216 @@ use the other functionality in savvy but will not be able to perform new
 sensitivity analyses.
 """
 
-from subprocess import run
+import fnmatch
+import math
+import mmap
+import os
+import socket
+import sqlite3
+import time
+import warnings
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                as_completed, wait)
+
+import numpy as np
+import pandas as pd
+
+from .data_processing import (format_salib_output, normalize_negative_indices,
+                              _share_vocabulary)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, columns are sent to the workers instead
+    shared_memory = None
 
 try:
+    from SALib.analyze import morris, sobol
     from SALib.sample import saltelli
+    from SALib.sample import morris as morris_sample
+    from SALib.util import read_param_file, scale_samples
+    from scipy.stats import norm, qmc
 except ImportError:
     print('----\nSALib is not installed - please install it to use '
           'sensitivity_tools.\nOther modules in savvy are independent of '
           'SALib.')
 
 
-def gen_params(num_vars, names, bounds, n, save_loc, second_ord=True):
+def _cross_sample_mask(problem):
+    """
+    Return a (num_groups, num_vars) boolean array that is True where the
+    Saltelli scheme takes a column from the other matrix (the parameter,
+    or the parameters of the group, being varied in that row).
+    """
+    groups = problem.get('groups')
+    if not groups:
+        return np.eye(problem['num_vars'], dtype=bool)
+    group_names = pd.unique(np.asarray(groups, dtype=object))
+    return group_names[:, None] == np.asarray(groups, dtype=object)[None, :]
+
+
+def _saltelli_block(base, mask, second_ord):
+    """
+    Build the Saltelli rows (A, AB_k, [BA_k,] B for each base point, in
+    the order of SALib.sample.saltelli) for a block of rows of the base
+    Sobol sequence, in the unit hypercube.
+    """
+    D = mask.shape[1]
+    a = base[:, None, :D]
+    b = base[:, None, D:]
+    blocks = [a, np.where(mask, b, a)]
+    if second_ord:
+        blocks.append(np.where(mask, a, b))
+    blocks.append(b)
+    return np.concatenate(blocks, axis=1).reshape(-1, D)
+
+
+def _stream_saltelli(problem, n, second_ord, filename, block_size,
+                     start_block):
+    """
+    Write the Saltelli sample for `problem` to the .npy file `filename` a
+    block of `block_size` base points at a time, starting at block
+    `start_block` of an existing file when resuming.  The block size and
+    the number of finished blocks are kept in `filename`.progress.
+
+    The base Sobol points are generated a block at a time too (scipy's
+    unscrambled Sobol sequence is the one SALib uses), so the memory used
+    depends on the block size and not on n.
+    """
+    mask = _cross_sample_mask(problem)
+    step = mask.shape[0] * (2 if second_ord else 1) + 2
+    shape = (n * step, problem['num_vars'])
+    progress = filename + '.progress'
+
+    if start_block:
+        if not os.path.isfile(progress):
+            raise ValueError('%s has no .progress file to resume from'
+                             % filename)
+        with open(progress) as f:
+            if f.readline() != 'block_size %i\n' % block_size:
+                raise ValueError('%s was written with a different block_size'
+                                 % filename)
+        param_sets = np.lib.format.open_memmap(filename, mode='r+')
+        if param_sets.shape != shape:
+            raise ValueError('%s does not hold a sample of this problem'
+                             % filename)
+    else:
+        param_sets = np.lib.format.open_memmap(filename, mode='w+',
+                                               dtype=np.float64, shape=shape)
+
+    # skip the start of the Sobol sequence the way SALib does
+    skip = max(int(2 ** math.ceil(math.log(n) / math.log(2))), 16)
+    sequence = qmc.Sobol(2 * problem['num_vars'], scramble=False)
+    sequence.fast_forward(skip + start_block * block_size)
+    for block in range(start_block, -(-n // block_size)):
+        start = block * block_size
+        stop = min(start + block_size, n)
+        with warnings.catch_warnings():
+            # blocks do not need to be powers of 2, the whole sample is
+            warnings.simplefilter('ignore', UserWarning)
+            base = sequence.random(stop - start)
+        param_sets[start * step:stop * step] = scale_samples(
+            _saltelli_block(base, mask, second_ord), problem)
+        param_sets.flush()
+        with open(progress, 'w') as f:
+            f.write('block_size %i\n%i\n' % (block_size, block + 1))
+
+    return param_sets
+
+
+def group_parameters(names, families):
+    """
+    Assign parameters to groups by name, e.g. to vary all the rate
+    constants of a reaction family together.
+
+    Parameters
+    -----------
+    names    : list
+               the names of the parameters.
+    families : dict
+               maps each group name to a shell-style pattern (such as
+               'k*') or a list of patterns matching the names of the
+               parameters in that group.  A parameter is put in the first
+               group it matches; parameters that match no pattern are
+               groups of their own.
+
+    Returns
+    --------
+    groups : list
+             the group name of each parameter, in the order of `names`,
+             for the `groups` argument of gen_params().
+    """
+    families = [(group, [patterns] if isinstance(patterns, str)
+                 else patterns) for group, patterns in families.items()]
+    groups = []
+    for name in names:
+        for group, patterns in families:
+            if any(fnmatch.fnmatchcase(name, pattern)
+                   for pattern in patterns):
+                groups.append(group)
+                break
+        else:
+            groups.append(name)
+    return groups
+
+
+def gen_params(num_vars, names, bounds, n, save_loc, second_ord=True,
+               memmap=None, block_size=1024, start_block=0, groups=None):
     """
     Generate the parameter sets for the Sobol sensitivity analysis.
     Saves a file with the information required for the analysis
     that will be performed later.
 
+    For large problems pass `memmap` to stream the parameter sets into a
+    .npy file on disk, `block_size` base points (block_size * 2(p+1) rows)
+    at a time, instead of building them in memory.
+
+    Pass `groups` to vary groups of parameters together (see
+    group_parameters()).  The number of parameter sets and the indices
+    from the analysis then depend on the number of groups g instead of
+    the number of parameters p (2n(g+1) parameter sets).
+
     Parameters
     -----------
-    num_vars   : int
-                 the number of parameters you will vary.
-    names      : list
-                 list of strings with the names of the parameters
-    bounds     : list
-                 list of lists, where each inner list contains the
-                 upper and lower bounds for a given parameter.
-    n          : int
-                 number of initial samples to generate from
-                 the pseudo-random Sobol sequence. n parameter sets
-                 will be generated using the Sobol sequence, then the
-                 Saltelli cross-sampling method will be applied to give a
-                 total of 2n(p+1) parameter sets to be run if second_ord =
-                 True.
-    save_loc   : str
-                 path to the directory where you would like to save the
-                 parameters.
-    second_ord : bool, optional
-                 a boolean to indicate whether or not to calculate second
-                 order sensitivity indices.  If False, only 1st and total
-                 order indices will be calculated and n(p+2) parameter sets
-                 will be generated.
+    num_vars    : int
+                  the number of parameters you will vary.
+    names       : list
+                  list of strings with the names of the parameters
+    bounds      : list
+                  list of lists, where each inner list contains the
+                  upper and lower bounds for a given parameter.
+    n           : int
+                  number of initial samples to generate from
+                  the pseudo-random Sobol sequence. n parameter sets
+                  will be generated using the Sobol sequence, then the
+                  Saltelli cross-sampling method will be applied to give a
+                  total of 2n(p+1) parameter sets to be run if second_ord =
+                  True.
+    save_loc    : str
+                  path to the directory where you would like to save the
+                  parameters.
+    second_ord  : bool, optional
+                  a boolean to indicate whether or not to calculate second
+                  order sensitivity indices.  If False, only 1st and total
+                  order indices will be calculated and n(p+2) parameter sets
+                  will be generated.
+    memmap      : str, optional
+                  the name of a .npy file to write the parameter sets to.
+                  The block size and the number of finished blocks are
+                  kept up to date in the file `memmap`.progress.
+    block_size  : int, optional
+                  the number of Sobol points cross-sampled at a time when
+                  memmap is given.
+    start_block : int, optional
+                  resume writing an interrupted memmap file from this block
+                  (the number of finished blocks in its .progress file),
+                  keeping the blocks before it.  Use the same n, block_size
+                  and second_ord; a different block_size raises a
+                  ValueError.
+    groups      : list, optional
+                  the group name of each parameter.  The groups are saved
+                  in the problem file, so the analysis reports one set of
+                  indices per group.
 
     Returns
     --------
@@ -56,7 +226,8 @@ def gen_params(num_vars, names, bounds, n, save_loc, second_ord=True):
          is appropriate) with each of the sets of parameters from
          this array.  The output must be stored in the same order
          as given in this parameter set array (one row of results
-         for each row of parameters).
+         for each row of parameters).  With memmap this is the
+         memory-mapped array in the .npy file.
     """
     # Check that num_vars is an integer
     if not isinstance(num_vars, int):
@@ -69,35 +240,1267 @@ def gen_params(num_vars, names, bounds, n, save_loc, second_ord=True):
         raise ValueError('length of `names` must equal num_vars')
 
     problem = {'num_vars': num_vars, 'names': names, 'bounds': bounds}
-    param_sets = saltelli.sample(problem, n, calc_second_order=second_ord)
+    if groups is not None:
+        if num_vars != len(groups):
+            raise ValueError('length of `groups` must equal num_vars')
+        if len(set(groups)) < 2:
+            raise ValueError('at least two groups are needed')
+        problem['groups'] = list(groups)
+    num_factors = _num_factors(problem)
+    if memmap is None:
+        param_sets = saltelli.sample(problem, n,
+                                     calc_second_order=second_ord)
+    else:
+        param_sets = _stream_saltelli(problem, n, second_ord, memmap,
+                                      block_size, start_block)
 
     if second_ord:
-        print('%s simulations will be run' % (2*n * (problem['num_vars'] + 1)))
+        print('%s simulations will be run' % (2*n * (num_factors + 1)))
     elif second_ord is False:
-        print('%s simulations will be run' % (n * (problem['num_vars'] + 2)))
+        print('%s simulations will be run' % (n * (num_factors + 2)))
 
     # Write the problem description to a file (required to run the analysis
     # after your model has been run with all the generated parameter sets)
     body = ''
     for i, name in enumerate(problem['names']):
-        body += '%s %s %s\n' % (name, problem['bounds'][i][0],
-                                problem['bounds'][i][1])
+        body += '%s %s %s' % (name, problem['bounds'][i][0],
+                              problem['bounds'][i][1])
+        if groups is not None:
+            body += ' %s' % groups[i]
+        body += '\n'
     with open(save_loc+'/saparams_%s-parameters_%s-n.txt'
-              % (num_vars, n), 'wb') as params:
+              % (num_vars, n), 'w') as params:
         params.write(body)
 
     return param_sets
 
 
+def gen_morris_params(num_vars, names, bounds, r, num_levels=4, seed=None):
+    """
+    Generate the parameter sets for a Morris elementary effects screening,
+    a cheap first stage that finds the parameters worth including in the
+    Sobol analysis (see screen_params()).
+
+    Parameters
+    -----------
+    num_vars   : int
+                 the number of parameters you will vary.
+    names      : list
+                 list of strings with the names of the parameters
+    bounds     : list
+                 list of lists, where each inner list contains the
+                 upper and lower bounds for a given parameter.
+    r          : int
+                 the number of Morris trajectories.  r(p+1) parameter sets
+                 will be generated; 10-20 trajectories is usually enough
+                 to rank the parameters.
+    num_levels : int, optional
+                 the number of grid levels of each parameter.
+    seed       : int, optional
+                 seed for the random trajectories.
+
+    Returns
+    --------
+    param_sets : numpy ndarray
+                 an ndarray where each row is one set of parameter values
+                 to run your model with, in order.
+    """
+    if not isinstance(num_vars, int):
+        raise TypeError('num_vars must be an integer')
+    if num_vars != len(bounds):
+        raise ValueError('bounds must be same length as num_vars')
+    if num_vars != len(names):
+        raise ValueError('length of `names` must equal num_vars')
+
+    problem = {'num_vars': num_vars, 'names': names, 'bounds': bounds}
+    param_sets = morris_sample.sample(problem, r, num_levels=num_levels,
+                                      seed=seed)
+    print('%s simulations will be run' % len(param_sets))
+    return param_sets
+
+
+def screen_params(problem, X, Y, threshold=0.05, keep=None, num_levels=4,
+                  seed=None):
+    """
+    Rank the parameters by their Morris elementary effects and return the
+    problem reduced to the important ones, so the Sobol sample from
+    gen_params() only varies the parameters that matter.
+
+    A parameter's importance is its mu_star (the mean absolute elementary
+    effect) divided by the largest mu_star of the same output, taking the
+    largest value over all the outputs.
+
+    Parameters
+    -----------
+    problem    : str or dict
+                 the path to a saparams* file with the full problem, or a
+                 SALib problem dictionary.
+    X          : numpy ndarray
+                 the parameter sets from gen_morris_params().
+    Y          : numpy ndarray
+                 the model results for X, one value (or one row of values
+                 for several outputs) per parameter set.
+    threshold  : float, optional
+                 keep the parameters with at least this importance.
+    keep       : int, optional
+                 keep this many of the most important parameters instead.
+    num_levels : int, optional
+                 the num_levels used to generate X.
+    seed       : int, optional
+                 seed for the bootstrap confidence intervals.
+
+    Returns
+    --------
+    ranking : pandas dataframe
+              the parameters from most to least important, with the
+              mu_star, mu_star_conf and sigma of the output they are most
+              important for and their importance.
+    reduced : dict
+              the problem with only the kept parameters ('num_vars',
+              'names' and 'bounds' for gen_params()), plus 'fixed': the
+              midpoint of the bounds of each dropped parameter, to run
+              the model with (see expand_params()).
+    """
+    problem = _load_problem(problem)
+    Y = np.asarray(Y, dtype=np.float64)
+    Y = Y.reshape(len(Y), -1)
+    results = [morris.analyze(problem, X, y, num_levels=num_levels,
+                              seed=seed) for y in Y.T]
+    mu_star = np.array([result['mu_star'] for result in results])
+    largest = mu_star.max(axis=1, keepdims=True)
+    importance = mu_star / np.where(largest > 0, largest, 1)
+    best = importance.argmax(axis=0)
+    params = np.arange(problem['num_vars'])
+
+    def pick(key):
+        return np.array([result[key] for result in results])[best, params]
+
+    ranking = pd.DataFrame({'Parameter': problem['names'],
+                            'mu_star': pick('mu_star'),
+                            'mu_star_conf': pick('mu_star_conf'),
+                            'sigma': pick('sigma'),
+                            'importance': importance.max(axis=0)},
+                           columns=['Parameter', 'mu_star', 'mu_star_conf',
+                                    'sigma', 'importance'])
+    ranking = ranking.sort_values('importance', ascending=False,
+                                  kind='mergesort').reset_index(drop=True)
+
+    if keep is not None:
+        kept = set(ranking['Parameter'][:keep])
+    else:
+        kept = set(ranking['Parameter'][ranking['importance'] >= threshold])
+    reduced = {'num_vars': len(kept), 'names': [], 'bounds': [],
+               'fixed': {}}
+    for name, bound in zip(problem['names'], problem['bounds']):
+        if name in kept:
+            reduced['names'].append(name)
+            reduced['bounds'].append(list(bound))
+        else:
+            reduced['fixed'][name] = (bound[0] + bound[1]) / 2.
+    return ranking, reduced
+
+
+def expand_params(param_sets, reduced, names):
+    """
+    Add the parameters dropped by screen_params() back to the parameter
+    sets of the reduced problem, at their fixed values, to give full
+    parameter sets for your model.
+
+    Parameters
+    -----------
+    param_sets : numpy ndarray
+                 the parameter sets from gen_params() for the reduced
+                 problem.
+    reduced    : dict
+                 the reduced problem returned by screen_params().
+    names      : list
+                 the names of all the parameters, in the order your model
+                 takes them.
+
+    Returns
+    --------
+    full_sets : numpy ndarray
+                the parameter sets with one column per name in `names`.
+    """
+    full_sets = np.empty((len(param_sets), len(names)))
+    columns = dict((name, i) for i, name in enumerate(reduced['names']))
+    for i, name in enumerate(names):
+        if name in columns:
+            full_sets[:, i] = param_sets[:, columns[name]]
+        else:
+            full_sets[:, i] = reduced['fixed'][name]
+    return full_sets
+
+
+def _param_source(param_sets):
+    """
+    Return what to send worker processes so they can read the parameter
+    sets themselves: the name of a .npy file, or (filename, dtype, offset,
+    shape, order) of a memory-mapped array.  Returns None for arrays in
+    memory, whose rows have to be sent a chunk at a time.
+    """
+    if isinstance(param_sets, str):
+        return param_sets
+    # only a whole mapping, the base of a sliced memmap is another memmap
+    if (isinstance(param_sets, np.memmap) and
+            isinstance(param_sets.base, mmap.mmap)):
+        order = ('F' if param_sets.flags.f_contiguous and
+                 not param_sets.flags.c_contiguous else 'C')
+        return (param_sets.filename, param_sets.dtype.str, param_sets.offset,
+                param_sets.shape, order)
+    return None
+
+
+def _evaluate_chunk(model, param_sets, start, stop, vectorized):
+    """
+    Evaluate the model for rows start:stop of the parameter sets (an array,
+    the name of a .npy file or the _param_source() of a memory-mapped
+    array) and return a 2D array with one row of results per parameter
+    set.
+    """
+    if isinstance(param_sets, str):
+        param_sets = np.load(param_sets, mmap_mode='r')
+    elif isinstance(param_sets, tuple):
+        filename, dtype, offset, shape, order = param_sets
+        param_sets = np.memmap(filename, dtype=dtype, mode='r',
+                               offset=offset, shape=shape, order=order)
+    rows = np.asarray(param_sets[start:stop])
+    if vectorized:
+        results = np.asarray(model(rows), dtype=np.float64)
+    else:
+        results = np.array([np.ravel(model(row)) for row in rows],
+                           dtype=np.float64)
+    return results.reshape(len(rows), -1)
+
+
+def _save_chunk(output, results, progress, num_rows, start, chunk, values):
+    """
+    Write the results of one chunk to the results array (creating the
+    .npy file once the number of outputs is known) and then record the
+    chunk in the progress file, so a recorded chunk is always on disk.
+    Returns the results array.
+    """
+    if output is None:
+        output = np.lib.format.open_memmap(results, mode='w+',
+                                           dtype=np.float64,
+                                           shape=(num_rows, values.shape[1]))
+    output[start:start + len(values)] = values
+    output.flush()
+    with open(progress, 'a') as f:
+        f.write('%i\n' % chunk)
+    return output
+
+
+def _read_progress(filename, chunk_size):
+    """
+    Return the set of finished chunks recorded in a run_model() progress
+    file, checking it was written with the same chunk size.
+    """
+    with open(filename) as progress:
+        lines = progress.read().split('\n')
+    if lines[0] != 'chunk_size %i' % chunk_size:
+        raise ValueError('%s was written with a different chunk_size'
+                         % filename)
+    # the last line may be incomplete if the run was killed while writing
+    return set(int(line) for line in lines[1:-1])
+
+
+class WorkQueue(object):
+    """
+    A queue of model runs kept in a SQLite database, which workers on any
+    host that can reach the file (and the parameter sets) pull chunks of
+    parameter sets from.  The results of each chunk are stored in the
+    database, and gather() reassembles them in parameter set order.
+
+    Submit the parameter sets once, start workers wherever the model can
+    run with a few lines of Python:
+
+        queue = WorkQueue('/shared/runs.db')
+        queue.work(my_model)
+
+    and collect the results with queue.gather('results.npy'), or let
+    run_model(..., queue=...) do all three.
+
+    Parameters
+    ----------
+    filename : str
+               the SQLite database file.  It is created by submit().
+    lease    : float, optional
+               seconds after which a chunk claimed by a worker that has
+               not finished it is given to another worker (e.g. because
+               its host went down).  By default claimed chunks are only
+               given out again if the worker reports an error.
+    timeout  : float, optional
+               seconds to wait for other workers to release the database.
+    """
+
+    def __init__(self, filename, lease=None, timeout=60.):
+        self.filename = filename
+        self.lease = lease
+        self.timeout = timeout
+
+    def _connect(self):
+        # autocommit, transactions are started explicitly where needed
+        return sqlite3.connect(self.filename, timeout=self.timeout,
+                               isolation_level=None)
+
+    def submit(self, param_sets, chunk_size=1000):
+        """
+        Add the chunks of parameter sets to the queue.  Submitting the
+        same parameter sets again keeps the finished chunks, so an
+        interrupted campaign can be continued.
+
+        Parameters
+        ----------
+        param_sets : numpy ndarray or str
+                     the parameter sets, or the name of the .npy file
+                     written by gen_params(memmap=...), which must be
+                     readable by every worker.  An array is saved to
+                     `filename`.params.npy.
+        chunk_size : int, optional
+                     the number of parameter sets per chunk.
+        """
+        if not isinstance(param_sets, str):
+            array = param_sets
+            param_sets = self.filename + '.params.npy'
+            np.save(param_sets, array)
+        param_sets = os.path.abspath(param_sets)
+        num_rows = len(np.load(param_sets, mmap_mode='r'))
+
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('CREATE TABLE IF NOT EXISTS meta '
+                               '(key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS chunks '
+                               '(id INTEGER PRIMARY KEY, start INTEGER, '
+                               'stop INTEGER, state TEXT, worker TEXT, '
+                               'claimed REAL, num_outputs INTEGER, '
+                               'results BLOB)')
+            meta = dict(connection.execute('SELECT key, value FROM meta'))
+            job = {'param_sets': param_sets, 'num_rows': str(num_rows),
+                   'chunk_size': str(chunk_size)}
+            if meta and meta != job:
+                raise ValueError('%s holds a different set of model runs'
+                                 % self.filename)
+            if not meta:
+                connection.executemany('INSERT INTO meta VALUES (?, ?)',
+                                       job.items())
+                connection.executemany(
+                    'INSERT INTO chunks (id, start, stop, state) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(chunk, start, min(start + chunk_size, num_rows),
+                      'pending')
+                     for chunk, start in enumerate(range(0, num_rows,
+                                                         chunk_size))])
+            connection.execute('COMMIT')
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def _claim(self, connection, worker):
+        """Claim the next chunk for `worker`, returning (id, start, stop)
+        or None if there is nothing left to claim."""
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            query = 'SELECT id, start, stop FROM chunks WHERE state = ?'
+            chunk = connection.execute(query + ' LIMIT 1',
+                                       ('pending',)).fetchone()
+            if chunk is None and self.lease is not None:
+                chunk = connection.execute(
+                    query + ' AND claimed < ? ORDER BY claimed LIMIT 1',
+                    ('running', now - self.lease)).fetchone()
+            if chunk is not None:
+                connection.execute('UPDATE chunks SET state = ?, '
+                                   'worker = ?, claimed = ? WHERE id = ?',
+                                   ('running', worker, now, chunk[0]))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return chunk
+
+    def work(self, model, vectorized=False, max_chunks=None):
+        """
+        Evaluate chunks from the queue until there are none left to claim.
+
+        Parameters
+        ----------
+        model      : function
+                     the model, as for run_model().
+        vectorized : bool, optional
+                     whether the model takes a 2D array of parameter sets,
+                     as for run_model().
+        max_chunks : int, optional
+                     stop after this many chunks.
+
+        Returns
+        --------
+        done : int
+               the number of chunks this worker evaluated.
+        """
+        worker = '%s:%i' % (socket.gethostname(), os.getpid())
+        connection = self._connect()
+        try:
+            param_sets = connection.execute(
+                'SELECT value FROM meta WHERE key = ?', ('param_sets',)
+            ).fetchone()[0]
+            done = 0
+            while max_chunks is None or done < max_chunks:
+                chunk = self._claim(connection, worker)
+                if chunk is None:
+                    break
+                chunk, start, stop = chunk
+                try:
+                    values = _evaluate_chunk(model, param_sets, start, stop,
+                                             vectorized)
+                except Exception:
+                    # give the chunk back so it is not lost
+                    connection.execute('UPDATE chunks SET state = ? '
+                                       'WHERE id = ? AND worker = ?',
+                                       ('pending', chunk, worker))
+                    raise
+                # a chunk reclaimed after its lease ran out may be finished
+                # twice, both results are the same
+                connection.execute(
+                    'UPDATE chunks SET state = ?, num_outputs = ?, '
+                    'results = ? WHERE id = ?',
+                    ('done', values.shape[1], values.tobytes(), chunk))
+                done += 1
+        finally:
+            connection.close()
+        return done
+
+    def status(self):
+        """Return the number of chunks in each state ('pending', 'running'
+        and 'done')."""
+        connection = self._connect()
+        try:
+            counts = dict(connection.execute(
+                'SELECT state, COUNT(*) FROM chunks GROUP BY state'))
+        finally:
+            connection.close()
+        return dict((state, counts.get(state, 0))
+                    for state in ('pending', 'running', 'done'))
+
+    def gather(self, results):
+        """
+        Write the results of all the chunks, in parameter set order, to the
+        .npy file `results` and return it as a memory-mapped array.
+        """
+        connection = self._connect()
+        try:
+            unfinished = connection.execute(
+                'SELECT COUNT(*) FROM chunks WHERE state != ?', ('done',)
+            ).fetchone()[0]
+            if unfinished:
+                raise ValueError('%i chunks have not been run yet'
+                                 % unfinished)
+            num_rows, num_outputs = connection.execute(
+                'SELECT MAX(stop), MAX(num_outputs) FROM chunks').fetchone()
+            output = np.lib.format.open_memmap(
+                results, mode='w+', dtype=np.float64,
+                shape=(num_rows, num_outputs))
+            for start, stop, values in connection.execute(
+                    'SELECT start, stop, results FROM chunks'):
+                output[start:stop] = np.frombuffer(
+                    values, dtype=np.float64).reshape(stop - start, -1)
+        finally:
+            connection.close()
+        output.flush()
+        return output
+
+
+def _run_queue(queue, model, param_sets, results, chunk_size, workers,
+               vectorized, poll=1.):
+    """
+    Run the model through a WorkQueue: submit the parameter sets, work on
+    the queue here (with `workers` processes) alongside any other workers
+    and gather the results once every chunk is done.
+    """
+    if not isinstance(queue, WorkQueue):
+        queue = WorkQueue(queue)
+    queue.submit(param_sets, chunk_size)
+    while True:
+        if workers is None or workers <= 1:
+            queue.work(model, vectorized)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in [pool.submit(queue.work, model, vectorized)
+                               for _ in range(workers)]:
+                    future.result()
+        status = queue.status()
+        if status['done'] == sum(status.values()):
+            return queue.gather(results)
+        # wait for the chunks other workers are running
+        time.sleep(poll)
+
+
+def run_model(model, param_sets, results, chunk_size=1000, workers=None,
+              vectorized=False, callback=None, queue=None):
+    """
+    Run your model with every parameter set from gen_params(), saving the
+    results in the same row order to a binary .npy file that can be
+    passed to analyze_outputs() (after loading it with numpy.load).
+
+    The parameter sets are evaluated in chunks of rows, optionally by a
+    pool of worker processes.  Each finished chunk is written to the
+    results file and then recorded in `results`.progress, so if the run
+    is interrupted calling run_model() again with the same arguments only
+    evaluates the chunks that were not finished.
+
+    To spread the runs over several hosts pass a `queue` (see WorkQueue):
+    this process (and its workers) then work on the queue alongside the
+    workers started on other hosts, and the results are gathered once
+    every chunk is done.
+
+    Parameters
+    ----------
+    model      : function
+                 the model, called as model(row) with one parameter set
+                 (a 1D array) and returning a number or a 1D array with
+                 one value per output measure.  With workers > 1 it must
+                 be a module level function so it can be sent to the
+                 worker processes.
+    param_sets : numpy ndarray or str
+                 the parameter sets, or the name of the .npy file written
+                 by gen_params(memmap=...).  Workers read their rows from
+                 the file (or the file of a memory-mapped array)
+                 themselves; the rows of an array in memory are sent to
+                 them one chunk at a time.
+    results    : str
+                 the name of the .npy file to write the results to.
+    chunk_size : int, optional
+                 the number of parameter sets evaluated per task and
+                 between checkpoints.  Use the same value when resuming.
+    workers    : int, optional
+                 number of worker processes.  By default the model is run
+                 in this process.
+    vectorized : bool, optional
+                 if True the model is called with a 2D array of parameter
+                 sets (one per row) and must return one result (or row of
+                 results) per parameter set.
+    callback   : function, optional
+                 called as callback(Y) after each chunk is saved, with the
+                 results of the rows finished so far (all the rows up to
+                 the first unfinished chunk).  If it returns True the run
+                 stops early, e.g. when a ConvergenceMonitor reports the
+                 indices have converged.  A stopped run can be continued
+                 later by calling run_model() again.  Not available with
+                 a queue.
+    queue      : WorkQueue or str, optional
+                 run the model through this queue (or the queue in this
+                 SQLite file) instead of the in-process pool.  The
+                 finished chunks are kept in the queue, so a run can
+                 still be continued by calling run_model() again.
+
+    Returns
+    --------
+    results : numpy ndarray
+              the memory-mapped (rows, outputs) array of results, only
+              the finished rows if the run was stopped by the callback.
+    """
+    if queue is not None:
+        if callback is not None:
+            raise ValueError('callback can not be used with a queue')
+        return _run_queue(queue, model, param_sets, results, chunk_size,
+                          workers, vectorized)
+
+    num_rows = len(np.load(param_sets, mmap_mode='r')
+                   if isinstance(param_sets, str) else param_sets)
+    chunks = list(range(-(-num_rows // chunk_size)))
+    progress = results + '.progress'
+
+    if os.path.isfile(progress) and os.path.isfile(results):
+        done = _read_progress(progress, chunk_size)
+        output = np.lib.format.open_memmap(results, mode='r+')
+    else:
+        with open(progress, 'w') as f:
+            f.write('chunk_size %i\n' % chunk_size)
+        done = set()
+        output = None
+    todo = [chunk for chunk in chunks if chunk not in done]
+    source = _param_source(param_sets)
+
+    def task(chunk):
+        start = chunk * chunk_size
+        stop = min(start + chunk_size, num_rows)
+        if source is None:
+            # only send the rows of this chunk to the worker
+            return (model, np.asarray(param_sets[start:stop]), 0,
+                    stop - start, vectorized)
+        return model, source, start, stop, vectorized
+
+    def save(chunk, values):
+        return _save_chunk(output, results, progress, num_rows,
+                           chunk * chunk_size, chunk, values)
+
+    def stop(chunk):
+        # pass the callback the rows before the first unfinished chunk,
+        # once there are any (workers can finish a later chunk first)
+        done.add(chunk)
+        finished = 0
+        while finished in done:
+            finished += 1
+        return (callback is not None and finished > 0 and
+                bool(callback(output[:finished * chunk_size])))
+
+    stopped = False
+    if workers is None or workers <= 1:
+        for chunk in todo:
+            output = save(chunk, _evaluate_chunk(*task(chunk)))
+            stopped = stop(chunk)
+            if stopped:
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # keep a few chunks per worker queued rather than all of them
+            pending = {}
+            todo = iter(todo)
+            try:
+                while not stopped:
+                    for chunk in todo:
+                        pending[pool.submit(_evaluate_chunk,
+                                            *task(chunk))] = chunk
+                        if len(pending) >= 2 * workers:
+                            break
+                    if not pending:
+                        break
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        chunk = pending.pop(future)
+                        output = save(chunk, future.result())
+                        stopped = stop(chunk) or stopped
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    if output is None:
+        # every chunk was already finished
+        output = np.lib.format.open_memmap(results, mode='r+')
+    if stopped:
+        finished = 0
+        while finished in done:
+            finished += 1
+        return output[:finished * chunk_size]
+    return output
+
+
+# Memory budget (bytes) for one chunk of bootstrap resamples in
+# sobol_indices() when chunk_size is not given
+_BOOTSTRAP_MEMORY = 2 ** 27
+
+
+class SobolIndices(dict):
+    """
+    The Sobol sensitivity indices of one output, with the same keys as the
+    results of SALib.analyze.sobol ('S1', 'S1_conf', 'ST', 'ST_conf' and,
+    if calculated, the square 'S2' and 'S2_conf' arrays) and the problem
+    they were calculated for, so they can be passed to format_salib_output.
+    """
+
+    def __init__(self, problem, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.problem = problem
+
+
+def _num_factors(problem):
+    """Return the number of parameters (or groups) of a problem."""
+    if problem.get('groups'):
+        return len(pd.unique(np.asarray(problem['groups'], dtype=object)))
+    return problem['num_vars']
+
+
+def _sobol_estimates(A, B, AB, BA):
+    """
+    Saltelli (2010) first and total order and Saltelli (2002) second order
+    estimators for a batch of samples.  A and B have shape (batch, N), AB
+    and BA (batch, N, D), where each batch item is the full sample or one
+    bootstrap resample.  Returns S1 and ST with shape (batch, D) and S2
+    with shape (batch, D, D) (None if BA is None).
+    """
+    var = np.var(np.concatenate((A, B), axis=1), axis=1)[:, None]
+    S1 = np.mean(B[:, :, None] * (AB - A[:, :, None]), axis=1) / var
+    ST = 0.5 * np.mean((A[:, :, None] - AB) ** 2, axis=1) / var
+    if BA is None:
+        return S1, ST, None
+    # E[BA_j * AB_k] for every pair (j, k) at once
+    Vjk = (np.matmul(BA.transpose(0, 2, 1), AB) / A.shape[1] -
+           np.mean(A * B, axis=1)[:, None, None]) / var[:, :, None]
+    S2 = Vjk - S1[:, :, None] - S1[:, None, :]
+    return S1, ST, S2
+
+
+def _add_moments(moments, values):
+    """
+    Combine the (count, mean, sum of squared deviations) of the bootstrap
+    estimates seen so far with a new chunk of estimates (first axis), so
+    the standard deviation is found without keeping every resample.
+    """
+    count = values.shape[0]
+    mean = values.mean(axis=0)
+    m2 = ((values - mean) ** 2).sum(axis=0)
+    if moments is None:
+        return count, mean, m2
+    count_a, mean_a, m2_a = moments
+    total = count_a + count
+    delta = mean - mean_a
+    return (total, mean_a + delta * count / total,
+            m2_a + m2 + delta ** 2 * count_a * count / total)
+
+
+def sobol_indices(problem, Y, calc_second_order=True, num_resamples=100,
+                  conf_level=0.95, seed=None, chunk_size=None):
+    """
+    Calculate Sobol sensitivity indices and their bootstrap confidence
+    intervals, giving the same results as SALib.analyze.sobol.analyze.
+
+    The estimators work on the A, B, AB and BA blocks of the results for
+    all the parameters at once, and the bootstrap resamples are evaluated
+    in chunks of resamples with batched index arrays instead of one
+    parameter (or pair of parameters) at a time.
+
+    Parameters
+    ----------
+    problem           : dict
+                        the SALib problem dictionary.
+    Y                 : numpy ndarray
+                        the model results for the parameter sets from
+                        gen_params(), in the same order.
+    calc_second_order : bool, optional
+                        whether to calculate second order indices (must
+                        match the sampling).
+    num_resamples     : int, optional
+                        the number of bootstrap resamples.
+    conf_level        : float, optional
+                        the confidence level of the confidence intervals.
+    seed              : int, optional
+                        seed for the bootstrap resampling.  The resamples
+                        are drawn the same way as SALib does, so a seed
+                        gives the same confidence intervals as SALib.
+    chunk_size        : int, optional
+                        the number of bootstrap resamples evaluated at
+                        once.  By default this is chosen so one chunk uses
+                        about 128 MB.
+
+    Returns
+    --------
+    Si : SobolIndices
+         dictionary with the S1, S1_conf, ST and ST_conf arrays and, if
+         calc_second_order is True, the S2 and S2_conf arrays (upper
+         triangle, NaN elsewhere).
+    """
+    return _sobol_indices(problem, Y, calc_second_order, num_resamples,
+                          conf_level, seed, chunk_size, calc_second_order)
+
+
+def _sobol_indices(problem, Y, calc_second_order, num_resamples, conf_level,
+                   seed, chunk_size, second_order):
+    """
+    sobol_indices(), with `second_order` False to skip the second order
+    indices (and their bootstrap) of a sample made for them.
+    """
+    D = _num_factors(problem)
+    Y = np.asarray(Y, dtype=np.float64).ravel()
+    step = 2 * D + 2 if calc_second_order else D + 2
+    if Y.size % step:
+        raise ValueError('Incorrect number of samples in model output. '
+                         'Confirm that calc_second_order matches the option '
+                         'used during sampling.')
+    if not 0 < conf_level < 1:
+        raise ValueError('conf_level must be between 0 and 1')
+    N = Y.size // step
+
+    # draw the resamples exactly as SALib does
+    if seed:
+        r = np.random.default_rng(seed).integers(N, size=(N, num_resamples))
+    else:
+        r = np.random.randint(N, size=(N, num_resamples))
+    Z = norm.ppf(0.5 + conf_level / 2)
+
+    Y = (Y - Y.mean()) / Y.std()
+    Y = Y.reshape(N, step)
+    A, B = Y[:, 0], Y[:, -1]
+    AB = Y[:, 1:D + 1]
+    BA = Y[:, D + 1:2 * D + 1] if second_order else None
+
+    S1, ST, S2 = _sobol_estimates(A[None], B[None], AB[None],
+                                  None if BA is None else BA[None])
+
+    if chunk_size is None:
+        per_resample = 8 * (N * (D + 2) * (3 if second_order else 2) +
+                            (3 * D * D if second_order else 0))
+        chunk_size = max(1, _BOOTSTRAP_MEMORY // per_resample)
+    first = total = second = None
+    for start in range(0, num_resamples, chunk_size):
+        # (chunk, N) resample indices, one row per resample
+        rows = r[:, start:start + chunk_size].T
+        s1, st, s2 = _sobol_estimates(A[rows], B[rows], AB[rows],
+                                      None if BA is None else BA[rows])
+        first = _add_moments(first, s1)
+        total = _add_moments(total, st)
+        if s2 is not None:
+            second = _add_moments(second, s2)
+
+    def conf(moments):
+        return Z * np.sqrt(moments[2] / (moments[0] - 1))
+
+    Si = SobolIndices(problem, S1=S1[0], S1_conf=conf(first), ST=ST[0],
+                      ST_conf=conf(total))
+    if second_order:
+        upper = np.triu(np.ones((D, D), dtype=bool), 1)
+        Si['S2'] = np.where(upper, S2[0], np.nan)
+        Si['S2_conf'] = np.where(upper, conf(second), np.nan)
+
+    return Si
+
+
+class ConvergenceMonitor(object):
+    """
+    Follow the Sobol indices of a model run as its results come in and
+    decide when they have converged, so a run with a generous `n` can be
+    stopped once the confidence intervals are narrow enough instead of
+    finding out afterwards that `n` was too low (e.g. from negative
+    indices).
+
+    Each call to update() (or to the monitor itself, so it can be passed
+    to run_model() as the callback) recalculates the first and total
+    order indices from scratch, from the results of the first whole base
+    samples received so far, which form a smaller Saltelli sample of the
+    same problem.  Second order indices are not calculated, even for a
+    sample made for them, since they do not decide convergence.  A
+    parameter has converged when the widths of its S1 and ST confidence
+    intervals (twice S1_conf and ST_conf) are at most `target` for every
+    output.  Outputs that are constant so far have no indices and are
+    left out, while NaN results (e.g. failed runs) keep the parameters
+    from converging.
+
+    Parameters
+    ----------
+    problem           : dict
+                        the SALib problem dictionary.
+    target            : float, optional
+                        the largest accepted confidence interval width.
+    calc_second_order : bool, optional
+                        whether the parameter sets were generated for
+                        second order indices (must match the sampling).
+    num_resamples     : int, optional
+                        the number of bootstrap resamples.
+    conf_level        : float, optional
+                        the confidence level of the confidence intervals.
+    seed              : int, optional
+                        seed for the bootstrap resampling.
+    min_samples       : int, optional
+                        the number of base samples needed before the
+                        indices can be considered converged.
+    """
+
+    def __init__(self, problem, target=0.05, calc_second_order=True,
+                 num_resamples=100, conf_level=0.95, seed=None,
+                 min_samples=16):
+        self.problem = problem
+        self.target = target
+        self.calc_second_order = calc_second_order
+        self.num_resamples = num_resamples
+        self.conf_level = conf_level
+        self.seed = seed
+        self.min_samples = min_samples
+        D = _num_factors(problem)
+        self.step = 2 * D + 2 if calc_second_order else D + 2
+        if problem.get('groups'):
+            self.names = list(pd.unique(np.asarray(problem['groups'],
+                                                   dtype=object)))
+        else:
+            self.names = list(problem['names'])
+        # number of base samples used for the current indices
+        self.n = 0
+        # one SobolIndices (S1 and ST only) per output, None for outputs
+        # that are constant
+        self.indices = []
+        # (n, largest confidence interval width) after each update
+        self.history = []
+        self.param_converged = np.zeros(D, dtype=bool)
+
+    @property
+    def converged(self):
+        """Whether every parameter has converged."""
+        return self.n >= self.min_samples and self.param_converged.all()
+
+    def update(self, Y):
+        """
+        Recalculate the indices from the results received so far.
+
+        Parameters
+        ----------
+        Y : numpy ndarray
+            the results of the first rows of the parameter sets, one
+            value (or row of values for several outputs) per row.
+
+        Returns
+        --------
+        converged : bool
+                    whether every parameter has converged.
+        """
+        Y = np.asarray(Y, dtype=np.float64)
+        n = len(Y) // self.step
+        if n < 2 or n == self.n:
+            return self.converged
+        self.n = n
+        Y = Y[:n * self.step].reshape(n * self.step, -1)
+        self.indices = [None if np.ptp(y) == 0 else
+                        _sobol_indices(self.problem, y,
+                                       self.calc_second_order,
+                                       self.num_resamples, self.conf_level,
+                                       self.seed, None, False)
+                        for y in Y.T]
+        widths = [2 * np.maximum(Si['S1_conf'], Si['ST_conf'])
+                  for Si in self.indices if Si is not None]
+        if widths:
+            widths = np.max(widths, axis=0)
+        else:
+            widths = np.full(len(self.names), np.nan)
+        # NaN widths (from NaN results) are not converged
+        self.param_converged = widths <= self.target
+        self.history.append((n, widths.max()))
+        return self.converged
+
+    __call__ = update
+
+    def report(self, output=0):
+        """
+        Return a dataframe with the current indices of one output, the
+        widths of their confidence intervals and whether each parameter
+        has converged.
+        """
+        Si = self.indices[output]
+        if Si is None:
+            raise ValueError('output %i is constant, it has no indices'
+                             % output)
+        return pd.DataFrame({'Parameter': self.names,
+                             'S1': Si['S1'], 'S1_width': 2 * Si['S1_conf'],
+                             'ST': Si['ST'], 'ST_width': 2 * Si['ST_conf'],
+                             'converged': self.param_converged},
+                            columns=['Parameter', 'S1', 'S1_width', 'ST',
+                                     'ST_width', 'converged'])
+
+
+def _load_problem(problem):
+    """Return the problem dictionary for a saparams* file or a dict."""
+    if isinstance(problem, dict):
+        return problem
+    return read_param_file(problem)
+
+
+_PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+
+def _select_columns(Y, columns):
+    """
+    Return the columns (numbers) of a 2D array, as a view when they are
+    consecutive so a memory-mapped array is not read into memory here.
+    """
+    if columns is None:
+        return Y, list(range(Y.shape[1]))
+    columns = list(columns)
+    if not all(isinstance(column, (int, np.integer)) for column in columns):
+        raise ValueError('the columns of an array must be given by number')
+    first = columns[0] if columns else 0
+    if columns == list(range(first, first + len(columns))):
+        return Y[:, first:first + len(columns)], columns
+    return Y[:, columns], columns
+
+
+def _load_results(Y, columns, delimiter):
+    """
+    Return the requested columns of the model results as a 2D array (in
+    the order of `columns`) and the list of column numbers or names.
+
+    Y can be a delimited text file (read once, parsing only the requested
+    columns), a .npy file (memory-mapped), a Parquet file, an array or a
+    dataframe.  Columns of dataframes and Parquet files can be given by
+    name or number.
+    """
+    if isinstance(Y, str):
+        if Y.endswith('.npy'):
+            Y = np.load(Y, mmap_mode='r')
+        elif Y.lower().endswith(_PARQUET_SUFFIXES):
+            names = (list(columns) if columns is not None and
+                     all(isinstance(column, str) for column in columns)
+                     else None)
+            Y = pd.read_parquet(Y, columns=names)
+        else:
+            Y = pd.read_csv(Y, sep=delimiter, header=None, usecols=columns,
+                            dtype=np.float64)
+            if columns is None:
+                columns = list(Y.columns)
+            return Y[list(columns)].values, list(columns)
+    if isinstance(Y, pd.DataFrame):
+        if columns is None:
+            columns = list(Y.columns)
+        positions = [Y.columns.get_loc(column) if isinstance(column, str)
+                     else column for column in columns]
+        return (Y.iloc[:, positions].to_numpy(dtype=np.float64),
+                list(Y.columns[positions]))
+    # np.asarray keeps a float64 memmap (or array) without copying it
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    return _select_columns(Y, columns)
+
+
+def _analyze_output(problem, y, name, calc_second_order, num_resamples,
+                    conf_level, seed, save_loc, estimator):
+    """
+    Run the Sobol analysis on one column of model results, save it to an
+    analysis file if save_loc is given and return its dataframes.
+    """
+    if estimator == 'savvy':
+        analyze = sobol_indices
+    elif estimator == 'salib':
+        analyze = sobol.analyze
+    else:
+        raise ValueError('estimator must be savvy or salib')
+    Si = analyze(problem, np.ascontiguousarray(y),
+                 calc_second_order=calc_second_order,
+                 num_resamples=num_resamples, conf_level=conf_level,
+                 seed=seed)
+    if save_loc is not None:
+        _write_analysis_file(os.path.join(save_loc, 'analysis_%s.txt' % name),
+                             Si)
+    return format_salib_output(Si, name)[name]
+
+
+def _analyze_shared_output(shm_name, shape, i, name, problem, options):
+    """
+    Analyze column `i` of the results matrix in the shared memory block
+    `shm_name` (stored one output per row) in a worker process.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        y = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[i].copy()
+    finally:
+        shm.close()
+    return i, _analyze_output(problem, y, name, *options)
+
+
+def _analyze_sent_output(y, i, name, problem, options):
+    """Analyze one column of results that was sent to a worker process."""
+    return i, _analyze_output(problem, y, name, *options)
+
+
+# Column order of the dataframes in an analysis file (and get_sa_data())
+_FIRST_COLUMNS = ['Parameter', 'S1', 'S1_conf', 'ST', 'ST_conf']
+_SECOND_COLUMNS = ['Parameter_1', 'Parameter_2', 'S2', 'S2_conf']
+
+
+def _sa_layout(df_list, negatives='clip'):
+    """
+    Give the dataframes of one output built from SALib results the column
+    order and negative index handling of get_sa_data().
+    """
+    df_list[0] = df_list[0][_FIRST_COLUMNS]
+    if df_list[1] is not False:
+        df_list[1] = df_list[1][_SECOND_COLUMNS]
+    normalize_negative_indices(df_list, negatives)
+    return df_list
+
+
+def _write_analysis_file(filename, Si):
+    """
+    Write the results of one Sobol analysis in the text format of the
+    SALib command line tool, which get_sa_data() reads.
+    """
+    df_list = format_salib_output(Si, '')['']
+    with open(filename, 'w') as result:
+        df_list[0].to_csv(result, sep=' ', index=False, float_format='%f',
+                          columns=_FIRST_COLUMNS)
+        if df_list[1] is not False:
+            result.write('\n')
+            df_list[1].to_csv(result, sep=' ', index=False,
+                              float_format='%f', columns=_SECOND_COLUMNS)
+
+
+def _analyze_outputs(problem, Y, columns, names, delimiter, order,
+                     num_resamples, conf_level, seed, save_loc, negatives,
+                     workers, estimator):
+    """
+    Generator behind analyze_outputs() and iter_analyze_outputs(), yields
+    (position in names, name, dataframes) as each output is finished.
+    """
+    problem = _load_problem(problem)
+    Y, columns = _load_results(Y, columns, delimiter)
+    if names is None:
+        names = [str(column) for column in columns]
+    if len(names) != Y.shape[1]:
+        raise ValueError('length of `names` must equal the number of columns')
+    options = (order == 2, num_resamples, conf_level, seed, save_loc,
+               estimator)
+
+    if workers is None or workers <= 1:
+        finished = (_analyze_sent_output(Y[:, i], i, name, problem, options)
+                    for i, name in enumerate(names))
+        shm = pool = None
+        futures = []
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        if shared_memory is not None:
+            # one copy of the results, stored one output per row so each
+            # worker reads a contiguous block
+            shm = shared_memory.SharedMemory(create=True, size=max(Y.nbytes,
+                                                                   1))
+            shared = np.ndarray(Y.shape[::-1], dtype=np.float64,
+                                buffer=shm.buf)
+            shared[:] = Y.T
+            del shared
+            futures = [pool.submit(_analyze_shared_output, shm.name,
+                                   Y.shape[::-1], i, name, problem, options)
+                       for i, name in enumerate(names)]
+        else:
+            shm = None
+            futures = [pool.submit(_analyze_sent_output, Y[:, i], i, name,
+                                   problem, options)
+                       for i, name in enumerate(names)]
+        finished = (future.result() for future in as_completed(futures))
+
+    try:
+        vocabulary = pd.Index([])
+        done = []
+        for i, df_list in finished:
+            num_names = len(vocabulary)
+            vocabulary = _share_vocabulary([df_list], vocabulary)
+            if len(vocabulary) > num_names:
+                # new names were appended, give the outputs that were
+                # already returned the extended vocabulary too
+                _share_vocabulary(done, vocabulary)
+            done.append(_sa_layout(df_list, negatives))
+            yield i, names[i], df_list
+    finally:
+        if pool is not None:
+            # stop analyzing if the caller stopped early
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def iter_analyze_outputs(problem, Y, columns=None, names=None, delimiter=' ',
+                         order=2, num_resamples=100, conf_level=0.95,
+                         seed=None, save_loc=None, negatives='clip',
+                         workers=None, estimator='savvy'):
+    """
+    Analyze several output measures like analyze_outputs(), yielding each
+    output as soon as its analysis is finished so the results can be used
+    while the other outputs are still being analyzed.
+
+    With workers > 1 the results matrix is copied once into shared memory
+    and the columns are analyzed by a pool of worker processes, which
+    read their own column from the shared block instead of each receiving
+    a copy of the matrix.  The outputs are then yielded in the order they
+    finish.  The parameters are the same as for analyze_outputs().
+
+    Returns
+    --------
+    outputs : generator
+              yields (name, dataframes) pairs, where the dataframes are the
+              value for `name` in the dictionary returned by
+              analyze_outputs().
+    """
+    for _, name, df_list in _analyze_outputs(
+            problem, Y, columns, names, delimiter, order, num_resamples,
+            conf_level, seed, save_loc, negatives, workers, estimator):
+        yield name, df_list
+
+
+def analyze_outputs(problem, Y, columns=None, names=None, delimiter=' ',
+                    order=2, num_resamples=100, conf_level=0.95, seed=None,
+                    save_loc=None, negatives='clip', workers=None,
+                    estimator='savvy'):
+    """
+    Perform the sensitivity analysis of several output measures in this
+    process, after you have run your model with all the parameters from
+    gen_params().  The results file is read once and every requested
+    column is analyzed with SALib, and the results are returned in the
+    same format as get_sa_data() so they do not have to be written to
+    analysis files and parsed again.
+
+    Parameters
+    ----------
+    problem       : str or dict
+                    the path to the saparams* file that contains the
+                    problem definition, or a SALib problem dictionary.
+    Y             : str, numpy ndarray or pandas dataframe
+                    the results, one row for each row of the param_sets
+                    generated in gen_params() and one column per output
+                    measure: the path to a delimited text file without a
+                    header, a .npy file (e.g. from run_model(), which is
+                    memory-mapped rather than read) or a Parquet file, or
+                    an array or dataframe of results.
+    columns       : list, optional
+                    the columns of the results to analyze, by number (zero
+                    indexed) or, for dataframes and Parquet files, by name.
+                    Default is all of them.
+    names         : list, optional
+                    the names of the output measures in `columns` (default
+                    is the column names, or numbers as strings).
+    delimiter     : str, optional
+                    the column delimiter used in a results text file.
+    order         : int, optional
+                    the maximum order of sensitivity indices [1 or 2].
+    num_resamples : int, optional
+                    the number of bootstrap resamples used for the
+                    confidence intervals.
+    conf_level    : float, optional
+                    the confidence level of the confidence intervals.
+    seed          : int, optional
+                    seed for the bootstrap resampling.
+    save_loc      : str, optional
+                    if given, the results are also saved as
+                    analysis_<name>.txt files in this directory, in the
+                    same format as the SALib command line tool.
+    negatives     : str, optional
+                    how negative indices are handled in the returned
+                    results ('clip', 'zero', 'keep' or 'nan', see
+                    get_sa_data()).  Saved files keep the SALib values.
+    workers       : int, optional
+                    number of worker processes that analyze columns at the
+                    same time, sharing one copy of the results in shared
+                    memory (see iter_analyze_outputs()).  By default the
+                    columns are analyzed one at a time in this process.
+    estimator     : str, optional
+                    'savvy' (default) uses the vectorized sobol_indices(),
+                    'salib' uses SALib.analyze.sobol.analyze.  Both give
+                    the same indices (and confidence intervals for a given
+                    seed).
+
+    Returns
+    --------
+    sa_dict : dict
+              a dictionary in the same format as the one returned by
+              get_sa_data(), with one key for each name (in the order of
+              `names`).
+    """
+    finished = sorted(_analyze_outputs(problem, Y, columns, names, delimiter,
+                                       order, num_resamples, conf_level, seed,
+                                       save_loc, negatives, workers,
+                                       estimator),
+                      key=lambda output: output[0])
+    return dict((name, df_list) for _, name, df_list in finished)
+
+
 def analyze_sensitivity(problem, Y, column, delimiter, order, name,
                         parallel=False, processors=4):
     """
     Perform the sensitivity analysis after you have run your model
-    with all the parameters from gen_params().  This is done from
-    the command line because it is faster and gives the option to
-    specify the column of the results file to analyze.  Parallel
-    processing is possible.  Results are saved to a file using the
-    name parameter.
+    with all the parameters from gen_params().  The analysis runs in
+    this process (see analyze_outputs()) and the results are saved to
+    analysis_<name>.txt in the current directory, in the format of the
+    SALib command line tool.  Parallel processing is possible.
 
     Parameters
     ----------
@@ -108,12 +1511,16 @@ def analyze_sensitivity(problem, Y, column, delimiter, order, name,
                  the path to the results file.  Results should
                  be in a file without a header.  Each line of the file must
                  contain results that correspond to the same line of the
-                 param_sets generated in gen_params().
-    column     : int
+                 param_sets generated in gen_params().  A .npy or Parquet
+                 file (or an array or dataframe) of results is also
+                 accepted, see analyze_outputs().
+    column     : int or str
                  integer specifying the column number of the results to
-                 analyze (zero indexed).
+                 analyze (zero indexed), or the column name in a Parquet
+                 file or dataframe.
     delimiter  : str
-                 string specifying the column delimiter used in the results.
+                 string specifying the column delimiter used in the results
+                 (only used for text files).
     order      : int
                  the maximum order of sensitivity indices [1 or 2].
     name       : str
@@ -127,16 +1534,16 @@ def analyze_sensitivity(problem, Y, column, delimiter, order, name,
 
     Returns
     --------
-    None
+    sa_dict : dict
+              the results in the format returned by get_sa_data().
     """
+    problem = _load_problem(problem)
+    Y, _ = _load_results(Y, [column], delimiter)
+    Si = sobol.analyze(problem, Y[:, 0], calc_second_order=(order == 2),
+                       parallel=parallel, n_processors=processors)
+    _write_analysis_file('analysis_%s.txt' % name, Si)
 
-    if parallel:
-        run(('python -m SALib.analyze.sobol -p %s -Y %s -c %i --delimiter %s '
-             '--max-order %i --parallel --processors %i > analysis_%s.txt'
-             % (problem, Y, column, delimiter, order, processors, name)).split(" "),
-            shell=True)
+    df_list = format_salib_output(Si, name)[name]
+    _share_vocabulary([df_list])
 
-    else:
-        run(('python -m SALib.analyze.sobol -p %s -Y %s'
-             ' -c %s --delimiter %s --max-order %s > analysis_%s.txt' %
-             (problem, Y, column, delimiter, order, name)).split(" "), shell=True)
+    return {name: _sa_layout(df_list)}
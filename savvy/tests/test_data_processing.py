@@ -1,6 +1,13 @@
 import unittest
+import gzip
+import lzma
+import os
 import os.path as op
+import shutil
+import tempfile
+import time
 
+import numpy as np
 from pandas.util.testing import assert_frame_equal
 try:
     import cPickle as pickle
@@ -8,7 +15,23 @@ except:
     import pickle
 
 import savvy
-from ..data_processing import get_sa_data, find_unimportant_params
+from ..data_processing import (get_sa_data, find_unimportant_params,
+                               _parse_analysis_file, clear_sa_cache,
+                               evict_sa_cache, SecondOrderMatrix,
+                               LazySAData, combine_sens, read_file,
+                               format_salib_output, format_salib_outputs,
+                               refresh_sa_data, SADataWatcher,
+                               export_sa_data, import_sa_data, SAStore,
+                               normalize_negative_indices, merge_results)
+try:
+    from SALib.analyze import sobol
+    from SALib.sample import saltelli
+except ImportError:
+    sobol = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 path = op.join(savvy.__path__[0], 'sample_data_files/')
 
@@ -16,6 +39,15 @@ path = op.join(savvy.__path__[0], 'sample_data_files/')
 comps = pickle.load(open(path + 'unittest_comparisons.pkl', 'rb'))
 
 
+def _names_as_objects(df):
+    """Return a copy of df with the categorical name columns as strings."""
+    df = df.copy()
+    for col in df.columns:
+        if col.startswith('Parameter'):
+            df[col] = df[col].astype(object)
+    return df
+
+
 class TestGetSAData(unittest.TestCase):
     """Tests for get_sa_data()"""
 
@@ -24,13 +56,14 @@ class TestGetSAData(unittest.TestCase):
         multiple)?"""
         # compare two dataframes with all sensitivity results
         df1 = comps[0]['sample-output1'][0]
-        df2 = get_sa_data(path)['sample-output1'][0]
+        df2 = _names_as_objects(get_sa_data(path)['sample-output1'][0])
         df3 = comps[0]['sample-output2'][1]
-        df4 = get_sa_data(path)['sample-output2'][1]
+        df4 = _names_as_objects(get_sa_data(path)['sample-output2'][1])
         # These are df's without second order indices
         df5 = comps[1]['sample-output3-no_second_order'][0]
-        df6 = get_sa_data(path + 'without_second_order_indices/')[
-            'sample-output3-no_second_order'][0]
+        df6 = _names_as_objects(
+            get_sa_data(path + 'without_second_order_indices/')[
+                'sample-output3-no_second_order'][0])
 
         # assert_frame_equal returns None if the two dataframes are the same
         self.assertIsNone(assert_frame_equal(df1, df2),
@@ -41,6 +74,643 @@ class TestGetSAData(unittest.TestCase):
                           msg='The `sample-output3` dataframes do not match')
 
 
+    def test_invalid_executor(self):
+        """Is an unknown executor refused even without workers?"""
+        for workers in [None, 1, 2]:
+            self.assertRaises(ValueError, get_sa_data, path, workers=workers,
+                              executor='threads')
+        self.assertRaises(ValueError, refresh_sa_data, {}, {}, path,
+                          executor='threads')
+
+    def test_workers_match_serial(self):
+        """Do the process and thread pools give the same dictionary, in the
+        same key order, as the serial path?"""
+        serial = get_sa_data(path)
+        for executor in ['process', 'thread']:
+            parallel = get_sa_data(path, workers=2, executor=executor)
+            self.assertEqual(list(serial.keys()), list(parallel.keys()))
+            for key in serial:
+                assert_frame_equal(serial[key][0], parallel[key][0])
+                assert_frame_equal(serial[key][1], parallel[key][1])
+
+    def test_shared_vocabulary(self):
+        """Do all the name columns share one categorical vocabulary?"""
+        sa_dict = get_sa_data(path)
+        dtype = sa_dict['sample-output1'][0]['Parameter'].dtype
+        self.assertEqual(dtype.name, 'category')
+        for df_list in sa_dict.values():
+            self.assertEqual(df_list[0]['Parameter'].dtype, dtype)
+            self.assertEqual(df_list[1]['Parameter_1'].dtype, dtype)
+            self.assertEqual(df_list[1]['Parameter_2'].dtype, dtype)
+        # the vocabulary keeps the order of the parameters in the files
+        self.assertEqual(list(dtype.categories[:4]),
+                         ['Tmax', 'h', 'Carbon', 'Hydrogen'])
+
+    def test_bad_executor(self):
+        """Is an error raised for an unknown executor?"""
+        self.assertRaises(ValueError, get_sa_data, path, 2, 'cluster')
+
+
+@unittest.skipIf(sobol is None, 'SALib is not installed')
+class TestFormatSALibOutput(unittest.TestCase):
+    """Tests for format_salib_output() and format_salib_outputs()"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.problem = {'num_vars': 4,
+                       'names': ['rxn1', 'rxn2', 'Tmax', 'Carbon'],
+                       'bounds': [[0, 1]] * 4}
+        X = saltelli.sample(cls.problem, 32)
+        cls.Si = sobol.analyze(cls.problem, X.sum(axis=1) + X[:, 0] * X[:, 1],
+                               num_resamples=10)
+
+    def test_matches_to_df(self):
+        """Are the dataframes the same as those from SALib's to_df()?"""
+        total, first, second = self.Si.to_df()
+        df1, df2 = format_salib_output(self.Si, 'run')['run']
+        self.assertEqual(list(df1.columns),
+                         ['ST', 'ST_conf', 'S1', 'S1_conf', 'Parameter'])
+        np.testing.assert_array_equal(df1['ST'], total['ST'])
+        np.testing.assert_array_equal(df1['S1_conf'], first['S1_conf'])
+        np.testing.assert_array_equal(df2['S2'], second['S2'])
+        self.assertEqual(list(zip(df2['Parameter_1'], df2['Parameter_2'])),
+                         list(second.index))
+
+    def test_pretty_names(self):
+        """Are names in `pretty_names` replaced in all the dataframes?"""
+        df1, df2 = format_salib_output(self.Si, 'run',
+                                       {'rxn1': 'one'})['run']
+        self.assertEqual(df1['Parameter'].tolist()[:2], ['one', 'rxn2'])
+        self.assertEqual(df2['Parameter_1'].tolist()[:3], ['one'] * 3)
+
+    def test_batch_shares_vocabulary(self):
+        """Does format_salib_outputs build an sa_dict with one vocabulary?"""
+        sa_dict = format_salib_outputs({'out1': self.Si, 'out2': self.Si})
+        self.assertEqual(sorted(sa_dict), ['out1', 'out2'])
+        dtype = sa_dict['out1'][0]['Parameter'].dtype
+        self.assertEqual(list(dtype.categories),
+                         ['k1', 'k2', 'Tmax', 'Carbon'])
+        self.assertEqual(sa_dict['out2'][1]['Parameter_2'].dtype, dtype)
+
+
+class TestParseAnalysisFile(unittest.TestCase):
+    """Tests for _parse_analysis_file()"""
+
+    def test_splits_first_and_second_order(self):
+        """Are both blocks of an analysis file parsed in one pass?"""
+        df, df2 = _parse_analysis_file(path + 'analysis_sample-output1.txt')
+        self.assertEqual(list(df.columns),
+                         ['Parameter', 'S1', 'S1_conf', 'ST', 'ST_conf'])
+        self.assertEqual(list(df2.columns),
+                         ['Parameter_1', 'Parameter_2', 'S2', 'S2_conf'])
+        # every pair of parameters has one second order row
+        self.assertEqual(len(df2), len(df) * (len(df) - 1) // 2)
+        self.assertEqual(df.loc[0, 'Parameter'], 'Tmax')
+        self.assertEqual((df2.loc[0, 'Parameter_1'],
+                          df2.loc[0, 'Parameter_2']), ('Tmax', 'h'))
+
+    def test_no_second_order(self):
+        """Is False returned when there are no second order indices?"""
+        df_list = _parse_analysis_file(
+            path + 'without_second_order_indices/'
+            'analysis_sample-output3-no_second_order.txt')
+        self.assertFalse(df_list[1])
+        self.assertEqual(len(df_list[0]), 410)
+
+
+class TestNegativeIndices(unittest.TestCase):
+    """Tests for the negatives and neg_counts options of get_sa_data()"""
+
+    def test_policies(self):
+        """Are negative indices clipped, zeroed, kept or set to NaN?"""
+        raw = _parse_analysis_file(path + 'analysis_sample-output2.txt')
+        negative = raw[0]['S1'] < 0
+        s2_negative = raw[1]['S2'] < 0
+        for policy, value in (('clip', 0.0001), ('zero', 0.0)):
+            df_list = [df.copy() for df in raw]
+            counts = normalize_negative_indices(df_list, policy)
+            self.assertEqual(counts['S1'], negative.sum())
+            self.assertEqual(counts['S2'], s2_negative.sum())
+            self.assertTrue((df_list[0]['S1'][negative] == value).all())
+            np.testing.assert_allclose(
+                df_list[0]['S1_conf'][negative],
+                (raw[0]['S1_conf'] + raw[0]['S1'] - value)[negative])
+        df_list = [df.copy() for df in raw]
+        normalize_negative_indices(df_list, 'nan')
+        self.assertTrue(df_list[0]['S1'][negative].isnull().all())
+        assert_frame_equal(df_list[0][~negative], raw[0][~negative])
+        df_list = [df.copy() for df in raw]
+        normalize_negative_indices(df_list, 'keep')
+        assert_frame_equal(df_list[1], raw[1])
+        self.assertRaises(ValueError, normalize_negative_indices, raw, 'abs')
+
+    def test_counts_from_cache(self):
+        """Are the counts the same when the results come from the cache?"""
+        cache_dir = tempfile.mkdtemp()
+        try:
+            parsed, cached = {}, {}
+            get_sa_data(path, cache_dir=cache_dir, neg_counts=parsed)
+            sa_dict = get_sa_data(path, cache_dir=cache_dir,
+                                  neg_counts=cached)
+            self.assertEqual(parsed, cached)
+            self.assertTrue(parsed['sample-output1']['S1'] > 0)
+            self.assertFalse((sa_dict['sample-output1'][0]['S1'] < 0).any())
+            kept = get_sa_data(path, cache_dir=cache_dir, negatives='keep')
+            self.assertEqual((kept['sample-output1'][0]['S1'] < 0).sum(),
+                             parsed['sample-output1']['S1'])
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+class TestSecondOrderFilters(unittest.TestCase):
+    """Tests for the s2_min and s2_top_k options of get_sa_data()"""
+
+    def setUp(self):
+        self.df2 = get_sa_data(path)['sample-output1'][1]
+
+    def test_s2_min(self):
+        """Are only the pairs with S2 >= s2_min kept?"""
+        df2 = get_sa_data(path, s2_min=0.01)['sample-output1'][1]
+        expected = self.df2[self.df2.S2 >= 0.01].reset_index(drop=True)
+        assert_frame_equal(_names_as_objects(df2),
+                           _names_as_objects(expected))
+
+    def test_s2_top_k(self):
+        """Are the k highest pairs kept, in file order?"""
+        df2 = get_sa_data(path, s2_top_k=20)['sample-output1'][1]
+        self.assertEqual(len(df2), 20)
+        self.assertEqual(sorted(df2.S2),
+                         sorted(self.df2.S2.nlargest(20)))
+        self.assertTrue(all(df2.S2 >= self.df2.S2.nlargest(20).min()))
+        both = get_sa_data(path, s2_min=0.025,
+                           s2_top_k=1000)['sample-output1'][1]
+        self.assertEqual(len(both), (self.df2.S2 >= 0.025).sum())
+
+    def test_filters_are_cached_separately(self):
+        """Does a cached full load not answer a filtered load?"""
+        cache_dir = tempfile.mkdtemp()
+        try:
+            get_sa_data(path, cache_dir=cache_dir)
+            df2 = get_sa_data(path, cache_dir=cache_dir,
+                              s2_top_k=5)['sample-output1'][1]
+            self.assertEqual(len(df2), 5)
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+class TestSecondOrderMatrix(unittest.TestCase):
+    """Tests for SecondOrderMatrix"""
+
+    def setUp(self):
+        self.df2 = get_sa_data(path)['sample-output1'][1]
+        self.matrix = SecondOrderMatrix.from_dataframe(self.df2)
+
+    def test_lookups(self):
+        """Do pair lookups return the values in the dataframe?"""
+        row = self.df2.iloc[100]
+        s2, s2_conf = self.matrix.get(row.Parameter_1, row.Parameter_2)
+        self.assertAlmostEqual(s2, row.S2, places=6)
+        self.assertAlmostEqual(s2_conf, row.S2_conf, places=6)
+        # the reversed pair is only found when mirroring
+        self.assertEqual(self.matrix.get(row.Parameter_2, row.Parameter_1),
+                         (s2, s2_conf))
+        self.assertTrue(np.isnan(self.matrix.get(
+            row.Parameter_2, row.Parameter_1, mirror=False)[0]))
+        self.assertEqual(len(self.matrix.row('Tmax')), len(self.matrix) - 1)
+
+    def test_top_and_round_trip(self):
+        """Do top() and to_dataframe() match the long dataframe?"""
+        expected = self.df2.sort_values('S2', ascending=False).head(5)
+        top = self.matrix.top(5)
+        self.assertEqual(list(top.Parameter_1), list(expected.Parameter_1))
+        self.assertEqual(list(top.Parameter_2), list(expected.Parameter_2))
+        assert_frame_equal(self.matrix.to_dataframe(), self.df2,
+                           check_exact=False, rtol=1e-6)
+
+    def test_save_and_load(self):
+        """Is a saved matrix memory-mapped when it is loaded?"""
+        directory = tempfile.mkdtemp()
+        try:
+            self.matrix.save(directory)
+            loaded = SecondOrderMatrix.load(directory)
+            self.assertIsInstance(loaded.s2, np.memmap)
+            self.assertEqual(loaded.names, self.matrix.names)
+            self.assertEqual(loaded.get('Tmax', 'h'),
+                             self.matrix.get('Tmax', 'h'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_sa_data_option(self):
+        """Does get_sa_data(s2_matrix=True) return matrices?"""
+        sa_dict = get_sa_data(path, s2_matrix=True)
+        self.assertIsInstance(sa_dict['sample-output1'][1], SecondOrderMatrix)
+        self.assertEqual(sa_dict['sample-output1'][1].s2.dtype, np.float32)
+
+
+class TestSACache(unittest.TestCase):
+    """Tests for the cache_dir option of get_sa_data()"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache_hit_matches_parsed(self):
+        """Are cached results the same as freshly parsed ones?"""
+        parsed = get_sa_data(path, cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        cached = get_sa_data(path, cache_dir=self.cache_dir)
+        for key in parsed:
+            assert_frame_equal(parsed[key][0], cached[key][0])
+            assert_frame_equal(parsed[key][1], cached[key][1])
+        no_s2 = path + 'without_second_order_indices/'
+        get_sa_data(no_s2, cache_dir=self.cache_dir)
+        cached = get_sa_data(no_s2, cache_dir=self.cache_dir)
+        self.assertFalse(cached['sample-output3-no_second_order'][1])
+
+    def test_cache_hit_is_memory_mapped(self):
+        """Are the numerical columns of a cache hit memory-mapped views?"""
+        get_sa_data(path, cache_dir=self.cache_dir)
+        cached = get_sa_data(path, cache_dir=self.cache_dir)
+        for df_list in cached.values():
+            for df, header in ((df_list[0], 'S1'), (df_list[0], 'ST_conf'),
+                               (df_list[1], 'S2')):
+                values = df[header].values
+                self.assertFalse(values.flags.writeable)
+                while not isinstance(values, np.memmap):
+                    values = values.base
+                    self.assertIsNotNone(values)
+
+    def test_invalidation_and_eviction(self):
+        """Can entries be cleared by directory and evicted by size?"""
+        get_sa_data(path, cache_dir=self.cache_dir)
+        get_sa_data(path + 'without_second_order_indices/',
+                    cache_dir=self.cache_dir)
+        self.assertEqual(clear_sa_cache(self.cache_dir, path), 2)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        get_sa_data(path, cache_dir=self.cache_dir, cache_size=0)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        get_sa_data(path, cache_dir=self.cache_dir)
+        self.assertEqual(evict_sa_cache(self.cache_dir, 10**9), 0)
+        self.assertEqual(clear_sa_cache(self.cache_dir), 2)
+
+
+class TestCompressedInput(unittest.TestCase):
+    """Tests for reading compressed analysis files"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _compress(self, opener, suffix):
+        for filename in ['analysis_sample-output1.txt',
+                         'analysis_sample-output2.txt']:
+            with open(path + filename, 'rb') as src, \
+                    opener(self.dir + filename + suffix, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+
+    def test_gzip_and_xz(self):
+        """Are .gz and .xz files read the same as the plain text files?"""
+        expected = get_sa_data(path)
+        self._compress(gzip.open, '.gz')
+        self._compress(lzma.open, '.xz')
+        os.remove(self.dir + 'analysis_sample-output2.txt.gz')
+        os.remove(self.dir + 'analysis_sample-output1.txt.xz')
+        sa_dict = get_sa_data(self.dir, workers=2, executor='thread')
+        self.assertEqual(sorted(sa_dict), sorted(expected))
+        for key in expected:
+            assert_frame_equal(sa_dict[key][0], expected[key][0])
+            assert_frame_equal(sa_dict[key][1], expected[key][1])
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstandard(self):
+        """Are .zst files read the same as the plain text files?"""
+        expected = get_sa_data(path)
+        self._compress(
+            lambda name, mode: zstandard.ZstdCompressor().stream_writer(
+                open(name, mode)), '.zst')
+        sa_dict = get_sa_data(self.dir)
+        for key in expected:
+            assert_frame_equal(sa_dict[key][1], expected[key][1])
+
+    @unittest.skipIf(zstandard is not None, 'zstandard is installed')
+    def test_zstandard_missing(self):
+        """Is an ImportError raised for .zst files without zstandard?"""
+        with open(self.dir + 'analysis_out.txt.zst', 'wb') as f:
+            f.write(b'not read')
+        self.assertRaises(ImportError, get_sa_data, self.dir)
+
+
+class TestRefreshSAData(unittest.TestCase):
+    """Tests for refresh_sa_data() and SADataWatcher"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp() + '/'
+        shutil.copy(path + 'analysis_sample-output1.txt', self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_only_changed_files_are_parsed(self):
+        """Are added, modified and deleted files all picked up?"""
+        sa_dict, fingerprints = {}, {}
+        self.assertEqual(refresh_sa_data(sa_dict, fingerprints, self.dir),
+                         (['sample-output1'], []))
+        first = sa_dict['sample-output1']
+        self.assertEqual(refresh_sa_data(sa_dict, fingerprints, self.dir),
+                         ([], []))
+        self.assertIs(sa_dict['sample-output1'], first)
+
+        shutil.copy(path + 'analysis_sample-output2.txt', self.dir)
+        shutil.copy(path + 'without_second_order_indices/'
+                    'analysis_sample-output3-no_second_order.txt', self.dir)
+        self.assertEqual(refresh_sa_data(sa_dict, fingerprints, self.dir),
+                         (['sample-output2', 'sample-output3-no_second_order'],
+                          []))
+        self.assertIs(sa_dict['sample-output1'], first)
+        expected = get_sa_data(self.dir)
+        for key in expected:
+            assert_frame_equal(sa_dict[key][0], expected[key][0])
+
+        stat = os.stat(self.dir + 'analysis_sample-output1.txt')
+        os.utime(self.dir + 'analysis_sample-output1.txt',
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        os.remove(self.dir + 'analysis_sample-output2.txt')
+        self.assertEqual(refresh_sa_data(sa_dict, fingerprints, self.dir),
+                         (['sample-output1'], ['sample-output2']))
+        self.assertIsNot(sa_dict['sample-output1'], first)
+        self.assertEqual(sorted(sa_dict), sorted(fingerprints))
+        self.assertEqual(sa_dict['sample-output1'][0]['Parameter'].dtype,
+                         sa_dict['sample-output3-no_second_order'][0]
+                         ['Parameter'].dtype)
+
+    def test_watcher_calls_back(self):
+        """Does a started watcher pick up a new file and call back?"""
+        calls = []
+        watcher = SADataWatcher(self.dir, interval=0.01,
+                                callback=lambda *args: calls.append(args))
+        self.assertEqual(list(watcher.sa_dict), ['sample-output1'])
+        watcher.start()
+        try:
+            # rename so the watcher never sees a partly written file
+            shutil.copy(path + 'analysis_sample-output2.txt',
+                        self.dir + 'tmp')
+            os.rename(self.dir + 'tmp',
+                      self.dir + 'analysis_sample-output2.txt')
+            for _ in range(500):
+                if calls:
+                    break
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(calls, [(['sample-output2'], [])])
+        self.assertIn('sample-output2', watcher.sa_dict)
+
+
+class TestLazySAData(unittest.TestCase):
+    """Tests for LazySAData"""
+
+    def test_keys_without_loading(self):
+        """Are the keys available before anything is parsed?"""
+        lazy = LazySAData(path)
+        self.assertEqual(list(lazy.keys()), list(get_sa_data(path).keys()))
+        self.assertEqual(len(lazy), 2)
+        self.assertEqual(lazy.loaded_keys(), [])
+        self.assertRaises(KeyError, lazy.__getitem__, 'missing')
+
+    def test_values_match_get_sa_data(self):
+        """Do loaded outputs match get_sa_data() and respect the LRU
+        bound?"""
+        sa_dict = get_sa_data(path)
+        lazy = LazySAData(path, max_resident=1)
+        for key in ['sample-output1', 'sample-output2']:
+            assert_frame_equal(lazy[key][0], sa_dict[key][0])
+            assert_frame_equal(lazy[key][1], sa_dict[key][1])
+            self.assertEqual(lazy.loaded_keys(), [key])
+
+    def test_find_unimportant_params(self):
+        """Does find_unimportant_params() accept a LazySAData?"""
+        self.assertEqual(find_unimportant_params('S1',
+                                                 sa_dict=LazySAData(path)),
+                         find_unimportant_params('S1', path))
+
+
+class TestSAStore(unittest.TestCase):
+    """Tests for export_sa_data(), import_sa_data() and SAStore"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = op.join(self.dir, 'run.sa')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        """Are dataframes the same after an export and import?"""
+        sa_dict = get_sa_data(path)
+        sa_dict.update(get_sa_data(path + 'without_second_order_indices/'))
+        export_sa_data(sa_dict, self.filename)
+        imported = import_sa_data(self.filename)
+        self.assertEqual(list(imported), list(sa_dict))
+        for key in sa_dict:
+            assert_frame_equal(imported[key][0], sa_dict[key][0],
+                               check_categorical=False)
+            if sa_dict[key][1] is False:
+                self.assertFalse(imported[key][1])
+            else:
+                assert_frame_equal(imported[key][1], sa_dict[key][1],
+                                   check_categorical=False)
+        self.assertEqual(imported['sample-output1'][0]['Parameter'].dtype,
+                         imported['sample-output2'][1]['Parameter_1'].dtype)
+
+    def test_matrix_round_trip(self):
+        """Are SecondOrderMatrix arrays stored and memory-mapped?"""
+        sa_dict = get_sa_data(path, s2_matrix=True)
+        export_sa_data(sa_dict, self.filename)
+        store = SAStore(self.filename, mmap_mode='r')
+        matrix = store['sample-output2'][1]
+        self.assertIsInstance(matrix.s2, np.memmap)
+        self.assertEqual(matrix.names, sa_dict['sample-output2'][1].names)
+        np.testing.assert_array_equal(matrix.s2_conf,
+                                      sa_dict['sample-output2'][1].s2_conf)
+
+    def test_reads_requested_outputs(self):
+        """Are only the requested outputs read?"""
+        export_sa_data(get_sa_data(path), self.filename)
+        imported = import_sa_data(self.filename, keys=['sample-output2'],
+                                  s2_matrix=True)
+        self.assertEqual(list(imported), ['sample-output2'])
+        self.assertIsInstance(imported['sample-output2'][1],
+                              SecondOrderMatrix)
+
+    def test_rejects_other_files(self):
+        """Is a ValueError raised for a file not written by export?"""
+        self.assertRaises(ValueError, SAStore,
+                          path + 'analysis_sample-output1.txt')
+
+
+class TestCombineSens(unittest.TestCase):
+    """Tests for combine_sens()"""
+
+    def setUp(self):
+        self.sa_dict = get_sa_data(path)
+        self.tensor = combine_sens(self.sa_dict)
+
+    def test_aligned_arrays(self):
+        """Are the indices aligned by parameter and output?"""
+        self.assertEqual(self.tensor['ST'].shape, (410, 2))
+        self.assertEqual(self.tensor.outputs, list(self.sa_dict.keys()))
+        df = self.sa_dict['sample-output2'][0]
+        row = self.tensor.params.get_loc('k12')
+        col = self.tensor.outputs.index('sample-output2')
+        for header in ['S1', 'S1_conf', 'ST', 'ST_conf']:
+            self.assertEqual(self.tensor[header][row, col],
+                             df.loc[df.Parameter == 'k12', header].values[0])
+
+    def test_queries(self):
+        """Do the cross-output queries give the expected answers?"""
+        df1 = self.sa_dict['sample-output1'][0].set_index('Parameter')
+        df2 = self.sa_dict['sample-output2'][0].set_index('Parameter')
+        self.assertEqual(self.tensor.max('ST')['Tmax'],
+                         max(df1.loc['Tmax', 'ST'], df2.loc['Tmax', 'ST']))
+        best = df1['ST'].idxmax()
+        self.assertIn('sample-output1', self.tensor.top_outputs(best, 1))
+        self.assertEqual(self.tensor.ranks('ST').min(axis=0).tolist(), [0, 0])
+        self.assertEqual(list(self.tensor.to_dataframe('S1').columns),
+                         self.tensor.outputs)
+
+
+class TestReadFile(unittest.TestCase):
+    """Tests for read_file()"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.csv = op.join(self.tmp, 'params.csv')
+        with open(self.csv, 'w') as f:
+            f.write('a,b,c\n')
+            for i in range(10):
+                f.write('%d,%d.5,%d\n' % (i, i, -i))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_drop_removes_columns(self):
+        """Are the columns in `drop` left out of the dataframe?"""
+        df = read_file(self.csv, drop=['b'])
+        self.assertEqual(list(df.columns), ['a', 'c'])
+        self.assertEqual(list(read_file(self.csv).columns), ['a', 'b', 'c'])
+
+    def test_dtype_and_numrows(self):
+        """Are `dtype` and `numrows` applied while parsing?"""
+        df = read_file(self.csv, numrows=4, dtype=np.float32)
+        self.assertEqual(len(df), 4)
+        self.assertTrue((df.dtypes == np.float32).all())
+
+    def test_chunksize_returns_iterator(self):
+        """Does `chunksize` give the file back in pieces?"""
+        chunks = list(read_file(self.csv, chunksize=3))
+        self.assertEqual([len(c) for c in chunks], [3, 3, 3, 1])
+
+    def test_memmap(self):
+        """Is the memmap dataframe backed by the .npy file?"""
+        npy = op.join(self.tmp, 'params.npy')
+        df = read_file(self.csv, drop=['c'], dtype=np.float32,
+                       chunksize=4, memmap=npy)
+        expected = read_file(self.csv, drop=['c'], dtype=np.float32)
+        assert_frame_equal(df, expected)
+        stored = np.load(npy)
+        self.assertEqual(stored.shape, (10, 2))
+        np.testing.assert_array_equal(stored, expected.values)
+
+
+class TestMergeResults(unittest.TestCase):
+    """Tests for merge_results()"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.runs = op.join(self.tmp, 'runs')
+        os.mkdir(self.runs)
+        self.results = op.join(self.tmp, 'results.npy')
+        self.Y = np.arange(30, dtype=np.float64).reshape(10, 3) / 7.
+        for row in range(8):
+            self.write_run(row)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_run(self, row, opener=open):
+        with opener(op.join(self.runs, 'run_%03d.out' % row), 'wt') as f:
+            f.write(' '.join(repr(value) for value in self.Y[row]) + '\n')
+
+    def test_rows_in_order(self):
+        """Are the per-run files merged in row order?"""
+        Y, missing, failed = merge_results(self.runs, self.results)
+        np.testing.assert_array_equal(Y, self.Y[:8])
+        np.testing.assert_array_equal(np.load(self.results), self.Y[:8])
+        self.assertEqual(len(missing) + len(failed), 0)
+
+    def test_missing_and_failed_rows(self):
+        """Are rows without a file or with a bad file flagged as NaN?"""
+        os.remove(op.join(self.runs, 'run_003.out'))
+        with open(op.join(self.runs, 'run_005.out'), 'w') as f:
+            f.write('1.0 not-a-number\n')
+        Y, missing, failed = merge_results(
+            op.join(self.runs, 'run_*.out'), self.results, num_rows=10)
+        self.assertEqual(list(missing), [3, 8, 9])
+        self.assertEqual(list(failed), [5])
+        self.assertTrue(np.isnan(Y[[3, 5, 8, 9]]).all())
+        np.testing.assert_array_equal(Y[:3], self.Y[:3])
+
+    def test_corrupt_compressed_run(self):
+        """Is a corrupt compressed run file flagged as failed?"""
+        suffixes = ['.gz', '.xz'] + (['.zst'] if zstandard else [])
+        for row, suffix in enumerate(suffixes):
+            os.remove(op.join(self.runs, 'run_%03d.out' % row))
+            with open(op.join(self.runs, 'run_%03d.out%s' % (row, suffix)),
+                      'wb') as f:
+                f.write(b'not compressed data')
+        Y, missing, failed = merge_results(self.runs, self.results)
+        self.assertEqual(list(failed), list(range(len(suffixes))))
+        np.testing.assert_array_equal(Y[len(suffixes):],
+                                      self.Y[len(suffixes):8])
+
+    def test_incremental_merge(self):
+        """Does merging again add the new runs and keep the merged ones?"""
+        merge_results(self.runs, self.results, num_rows=10)
+        # merged rows are not read again
+        os.remove(op.join(self.runs, 'run_000.out'))
+        self.write_run(8)
+        self.write_run(9, gzip.open)
+        os.rename(op.join(self.runs, 'run_009.out'),
+                  op.join(self.runs, 'run_009.out.gz'))
+        Y, missing, failed = merge_results(self.runs, self.results)
+        np.testing.assert_array_equal(Y, self.Y)
+        self.assertEqual(len(missing) + len(failed), 0)
+        self.assertRaises(ValueError, merge_results, self.runs,
+                          self.results, num_rows=12)
+
+    def test_results_in_runs_directory(self):
+        """Can the merged files be kept in the runs directory?"""
+        results = op.join(self.runs, 'results.npy')
+        merge_results(self.runs, results, num_rows=10)
+        self.write_run(8)
+        self.write_run(9)
+        Y, missing, failed = merge_results(self.runs, results)
+        np.testing.assert_array_equal(Y, self.Y)
+        self.assertEqual(len(missing) + len(failed), 0)
+
+    def test_row_index(self):
+        """Can the rows be given by a mapping of file names?"""
+        names = ['run_%03d.out' % row for row in range(8)]
+        Y, _, _ = merge_results(
+            [op.join(self.runs, name) for name in names], self.results,
+            row_index=dict(zip(names, range(7, -1, -1))))
+        np.testing.assert_array_equal(Y, self.Y[7::-1])
+
+
 class TestFindUnimportantParams(unittest.TestCase):
     """Tests for find_unimpotant_params()"""
 
@@ -56,6 +726,12 @@ class TestFindUnimportantParams(unittest.TestCase):
         self.assertEquals(find_unimportant_params('S1', path),
                           expected_results)
 
+    def test_reuses_loaded_results(self):
+        """Does passing an sa_dict give the same answer as a path?"""
+        self.assertEqual(find_unimportant_params('ST', path),
+                         find_unimportant_params(
+                             'ST', sa_dict=get_sa_data(path)))
+
 
 if __name__ == '__main__':
     unittest.main()
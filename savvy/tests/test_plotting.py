@@ -10,6 +10,7 @@ except:
 
 import savvy
 from ..plotting import make_plot, make_second_order_heatmap
+from ..data_processing import SecondOrderMatrix
 
 # Load a sample file to use for testing
 path = op.join(savvy.__path__[0], 'sample_data_files/')
@@ -125,6 +126,14 @@ class TestMakeSecondOrderHeatmap(unittest.TestCase):
         expected_params = ['k81', 'k316', 'Tmax', 'Carbon', 'k199']
         self.assertTrue(set(displayed_params) == set(expected_params))
 
+    def test_accepts_second_order_matrix(self):
+        """Does a SecondOrderMatrix give the same boxes as a dataframe?"""
+        plot_df = make_second_order_heatmap(df2, top=5)
+        plot_matrix = make_second_order_heatmap(
+            SecondOrderMatrix.from_dataframe(df2), top=5)
+        self.assertEqual(set(plot_df.y_range.factors),
+                         set(plot_matrix.y_range.factors))
+
     def test_correct_width_and_height(self):
         """Are the plotted dimensions correct"""
         plot = make_second_order_heatmap(df2)
@@ -1,8 +1,29 @@
 import unittest
+import multiprocessing
 import os
+import os.path as op
+import shutil
+import tempfile
+import time
 import numpy as np
+import pandas as pd
 
-from ..sensitivity_tools import gen_params
+try:
+    import pyarrow
+except ImportError:
+    try:
+        import fastparquet as pyarrow
+    except ImportError:
+        pyarrow = None
+
+from ..sensitivity_tools import (gen_params, group_parameters,
+                                 analyze_outputs, iter_analyze_outputs,
+                                 analyze_sensitivity, sobol_indices,
+                                 run_model, ConvergenceMonitor,
+                                 gen_morris_params, screen_params,
+                                 expand_params, WorkQueue, _param_source,
+                                 saltelli, sobol)
+from ..data_processing import get_sa_data
 
 cwd = os.getcwd()
 
@@ -56,13 +77,638 @@ class TestGenParams(unittest.TestCase):
         self.assertEqual(gen_params(3, names, bounds, 1, cwd, True).all(),
                          expectedt.all())
 
+    def test_problem_file_written(self):
+        """Is the problem definition saved so SALib can read it?"""
+        names = ['para1', 'para2', 'para3']
+        bounds = [[0, 1], [2, 6], [0, 2.3]]
+        gen_params(3, names, bounds, 4, cwd, True)
+        with open(cwd + '/saparams_3-parameters_4-n.txt') as params:
+            self.assertEqual(params.read(),
+                             'para1 0 1\npara2 2 6\npara3 0 2.3\n')
+
     def tearDown(self):
         [os.remove(cwd+'/'+name) for name in os.listdir(cwd)
          if name.startswith('saparams')]
 
-# the function `analyze_sensitivity` is not being tested because this
-# function does not do anything that has not already been tested in SALib
-# (`analyze_sensitivity` just formats the bash command that runs the analysis)
+
+class TestGenParamsMemmap(unittest.TestCase):
+    """Tests for the memmap option of gen_params"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.npy = os.path.join(self.dir, 'param_sets.npy')
+        self.names = ['para%i' % i for i in range(6)]
+        self.bounds = [[0, i + 1.0] for i in range(6)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_in_memory_sample(self):
+        """Are the streamed parameter sets the same as in memory?"""
+        for second_ord in [True, False]:
+            expected = gen_params(6, self.names, self.bounds, 16, self.dir,
+                                  second_ord)
+            param_sets = gen_params(6, self.names, self.bounds, 16,
+                                    self.dir, second_ord, memmap=self.npy,
+                                    block_size=5)
+            np.testing.assert_array_equal(np.load(self.npy), expected)
+            self.assertEqual(param_sets.shape, expected.shape)
+            with open(self.npy + '.progress') as progress:
+                self.assertEqual(progress.read(), 'block_size 5\n4\n')
+
+    def test_resume(self):
+        """Are the blocks from start_block on rewritten on resume?"""
+        expected = gen_params(6, self.names, self.bounds, 16, self.dir,
+                              memmap=self.npy, block_size=4)
+        expected = np.array(expected)
+        # pretend the run stopped after two of the four blocks
+        param_sets = np.lib.format.open_memmap(self.npy, mode='r+')
+        param_sets[len(param_sets) // 2:] = 0
+        param_sets.flush()
+        del param_sets
+        gen_params(6, self.names, self.bounds, 16, self.dir,
+                   memmap=self.npy, block_size=4, start_block=2)
+        np.testing.assert_array_equal(np.load(self.npy), expected)
+        self.assertRaises(ValueError, gen_params, 6, self.names, self.bounds,
+                          32, self.dir, memmap=self.npy, block_size=4,
+                          start_block=1)
+
+    def test_resume_with_other_block_size(self):
+        """Is resuming with a different block_size refused?"""
+        gen_params(6, self.names, self.bounds, 16, self.dir,
+                   memmap=self.npy, block_size=4)
+        self.assertRaises(ValueError, gen_params, 6, self.names, self.bounds,
+                          16, self.dir, memmap=self.npy, block_size=8,
+                          start_block=1)
+        os.remove(self.npy + '.progress')
+        self.assertRaises(ValueError, gen_params, 6, self.names, self.bounds,
+                          16, self.dir, memmap=self.npy, block_size=4,
+                          start_block=1)
+
+    def test_large_sample_matches_salib(self):
+        """Do the streamed base points match SALib beyond one block?"""
+        expected = gen_params(6, self.names, self.bounds, 1000, self.dir)
+        gen_params(6, self.names, self.bounds, 1000, self.dir,
+                   memmap=self.npy, block_size=96)
+        np.testing.assert_array_equal(np.load(self.npy), expected)
+
+
+def _ishigami(X):
+    """The Ishigami test function, a standard sensitivity benchmark."""
+    return (np.sin(X[:, 0]) + 7 * np.sin(X[:, 1]) ** 2 +
+            0.1 * X[:, 2] ** 4 * np.sin(X[:, 0]))
+
+
+class TestGroups(unittest.TestCase):
+    """Tests for sampling and analyzing groups of parameters"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.names = ['Tmax', 'x2', 'k0', 'k1', 'k2', 'k3']
+        self.bounds = [[-np.pi, np.pi]] * 6
+        self.groups = group_parameters(self.names, {'rates': 'k*'})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_group_parameters(self):
+        """Are parameters grouped by pattern, and the others left alone?"""
+        self.assertEqual(self.groups, ['Tmax', 'x2'] + ['rates'] * 4)
+        self.assertEqual(group_parameters(self.names,
+                                          {'a': ['k0', 'k1'], 'b': 'k*'}),
+                         ['Tmax', 'x2', 'a', 'a', 'b', 'b'])
+
+    def test_sample_scales_with_groups(self):
+        """Do the number of parameter sets depend on the number of groups,
+        and is the problem file written with the groups?"""
+        param_sets = gen_params(6, self.names, self.bounds, 8, self.dir,
+                                groups=self.groups)
+        self.assertEqual(param_sets.shape, (2 * 8 * (3 + 1), 6))
+        with open(op.join(self.dir, 'saparams_6-parameters_8-n.txt')) as f:
+            self.assertEqual(f.read().split('\n')[2].split()[-1], 'rates')
+        self.assertRaises(ValueError, gen_params, 6, self.names, self.bounds,
+                          8, self.dir, groups=['all'] * 6)
+
+    def test_analysis_reports_groups(self):
+        """Does the analysis of a grouped sample give one row per group and
+        match SALib?"""
+        X = gen_params(6, self.names, self.bounds, 64, self.dir,
+                       groups=self.groups)
+        Y = _ishigami(X)
+        problem = os.path.join(self.dir, 'saparams_6-parameters_64-n.txt')
+        sa_dict = analyze_outputs(problem, Y[:, None], names=['y'], seed=1)
+        self.assertEqual(list(sa_dict['y'][0]['Parameter']),
+                         ['Tmax', 'x2', 'rates'])
+        self.assertEqual(len(sa_dict['y'][1]), 3)
+        expected = sobol.analyze(dict(names=self.names, bounds=self.bounds,
+                                      num_vars=6, groups=self.groups),
+                                 Y, seed=1)
+        np.testing.assert_allclose(sa_dict['y'][0]['ST'], expected['ST'])
+
+
+class TestScreening(unittest.TestCase):
+    """Tests for the Morris screening stage"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.names = ['x%i' % i for i in range(8)]
+        cls.bounds = [[0, 1]] * 8
+        cls.problem = {'num_vars': 8, 'names': cls.names,
+                       'bounds': cls.bounds}
+        cls.X = gen_morris_params(8, cls.names, cls.bounds, 10, seed=1)
+        # Sobol G function: x0, x1 and x2 matter, the others barely do
+        a = np.array([0, 1, 4.5, 99, 99, 99, 99, 99])
+        cls.Y = np.prod((np.abs(4 * cls.X - 2) + a) / (1 + a), axis=1)
+
+    def test_sample_size(self):
+        """Are r(p+1) parameter sets generated?"""
+        self.assertEqual(self.X.shape, (10 * 9, 8))
+
+    def test_keeps_important_params(self):
+        """Are the important parameters ranked first and kept?"""
+        ranking, reduced = screen_params(self.problem, self.X, self.Y,
+                                         seed=1)
+        self.assertEqual(list(ranking['Parameter'][:3]), ['x0', 'x1', 'x2'])
+        self.assertEqual(reduced['names'], ['x0', 'x1', 'x2'])
+        self.assertEqual(reduced['num_vars'], 3)
+        self.assertEqual(reduced['bounds'], [[0, 1]] * 3)
+        self.assertEqual(sorted(reduced['fixed']), self.names[3:])
+
+    def test_keep_top(self):
+        """Does `keep` keep the given number of parameters?"""
+        _, reduced = screen_params(self.problem, self.X, self.Y, keep=2,
+                                   seed=1)
+        self.assertEqual(reduced['names'], ['x0', 'x1'])
+
+    def test_several_outputs(self):
+        """Is a parameter kept if it matters for any output?"""
+        Y = np.column_stack([self.Y, self.X[:, 7]])
+        _, reduced = screen_params(self.problem, self.X, Y, seed=1)
+        self.assertEqual(reduced['names'], ['x0', 'x1', 'x2', 'x7'])
+
+    def test_expand_params(self):
+        """Are the dropped parameters added back at their fixed values?"""
+        _, reduced = screen_params(self.problem, self.X, self.Y, keep=2,
+                                   seed=1)
+        param_sets = np.array([[0.1, 0.2], [0.3, 0.4]])
+        full_sets = expand_params(param_sets, reduced, self.names)
+        self.assertEqual(full_sets.shape, (2, 8))
+        np.testing.assert_array_equal(full_sets[:, :2], param_sets)
+        np.testing.assert_array_equal(full_sets[:, 2:], 0.5)
+
+
+class TestSobolIndices(unittest.TestCase):
+    """Tests for the vectorized sobol_indices() estimator"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.problem = {'num_vars': 5,
+                       'names': ['x1', 'x2', 'x3', 'x4', 'x5'],
+                       'bounds': [[-np.pi, np.pi]] * 5}
+        X = saltelli.sample(cls.problem, 128)
+        cls.Y = _ishigami(X) + 0.5 * X[:, 3] * X[:, 4]
+
+    def assertMatchesSALib(self, Si, expected):
+        self.assertEqual(sorted(Si), sorted(expected))
+        for key in expected:
+            np.testing.assert_allclose(Si[key], expected[key], rtol=1e-9,
+                                       atol=1e-12, err_msg=key)
+
+    def test_matches_salib(self):
+        """Are the indices and confidence intervals the same as SALib's?"""
+        expected = sobol.analyze(self.problem, self.Y, num_resamples=50,
+                                 seed=7)
+        self.assertMatchesSALib(sobol_indices(self.problem, self.Y,
+                                              num_resamples=50, seed=7),
+                                expected)
+
+    def test_chunked_bootstrap(self):
+        """Does evaluating the resamples in chunks change the results?"""
+        expected = sobol.analyze(self.problem, self.Y, num_resamples=50,
+                                 seed=7)
+        for chunk_size in [1, 7, 50]:
+            self.assertMatchesSALib(sobol_indices(
+                self.problem, self.Y, num_resamples=50, seed=7,
+                chunk_size=chunk_size), expected)
+
+    def test_first_order_only(self):
+        """Are first and total order indices right without second order?"""
+        X = saltelli.sample(self.problem, 128, calc_second_order=False)
+        Y = _ishigami(X)
+        expected = sobol.analyze(self.problem, Y, calc_second_order=False,
+                                 num_resamples=20, seed=3)
+        self.assertMatchesSALib(sobol_indices(self.problem, Y, False, 20,
+                                              seed=3), expected)
+        self.assertRaises(ValueError, sobol_indices, self.problem, Y)
+
+
+class TestAnalyzeOutputs(unittest.TestCase):
+    """Tests for analyze_outputs() and analyze_sensitivity()"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.problem = {'num_vars': 3, 'names': ['x1', 'x2', 'x3'],
+                       'bounds': [[-np.pi, np.pi]] * 3}
+        X = saltelli.sample(cls.problem, 128)
+        cls.Y = np.column_stack((_ishigami(X), X.sum(axis=1)))
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.results = os.path.join(self.dir, 'results.txt')
+        np.savetxt(self.results, self.Y)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_salib(self):
+        """Are the indices the ones SALib calculates for each column?"""
+        for estimator in ['savvy', 'salib']:
+            sa_dict = analyze_outputs(self.problem, self.results,
+                                      columns=[1, 0],
+                                      names=['sum', 'ishigami'], seed=2,
+                                      negatives='keep', estimator=estimator)
+            self.assertEqual(sorted(sa_dict), ['ishigami', 'sum'])
+            for name, column in (('sum', 1), ('ishigami', 0)):
+                Si = sobol.analyze(self.problem, self.Y[:, column], seed=2)
+                np.testing.assert_allclose(sa_dict[name][0]['ST'], Si['ST'])
+                upper = np.triu_indices(3, 1)
+                np.testing.assert_allclose(sa_dict[name][1]['S2_conf'],
+                                           Si['S2_conf'][upper])
+        self.assertEqual(list(sa_dict['sum'][0].columns),
+                         ['Parameter', 'S1', 'S1_conf', 'ST', 'ST_conf'])
+
+    def assertSameIndices(self, sa_dict, expected):
+        for name in expected:
+            for df, df_expected in zip(sa_dict[name], expected[name]):
+                for column in ('ST', 'S1', 'S2'):
+                    if column in df_expected:
+                        np.testing.assert_allclose(df[column],
+                                                   df_expected[column])
+
+    def test_npy_results(self):
+        """Does a .npy results file give the same indices as text?"""
+        npy = os.path.join(self.dir, 'results.npy')
+        np.save(npy, self.Y)
+        expected = analyze_outputs(self.problem, self.results, columns=[1],
+                                   names=['sum'], seed=2)
+        sa_dict = analyze_outputs(self.problem, npy, columns=[1],
+                                  names=['sum'], seed=2)
+        self.assertSameIndices(sa_dict, expected)
+
+    def test_columns_by_name(self):
+        """Can the columns of a dataframe be chosen by name?"""
+        df = pd.DataFrame(self.Y, columns=['ishigami', 'sum'])
+        expected = analyze_outputs(self.problem, self.Y, columns=[1],
+                                   names=['sum'], seed=2)
+        sa_dict = analyze_outputs(self.problem, df, columns=['sum'], seed=2)
+        self.assertEqual(list(sa_dict), ['sum'])
+        self.assertSameIndices(sa_dict, expected)
+        self.assertRaises(ValueError, analyze_outputs, self.problem, self.Y,
+                          columns=['sum'])
+
+    @unittest.skipIf(pyarrow is None, 'no Parquet engine installed')
+    def test_parquet_results(self):
+        """Can results be read from a Parquet file, by column name?"""
+        parquet = os.path.join(self.dir, 'results.parquet')
+        pd.DataFrame(self.Y, columns=['ishigami', 'sum']).to_parquet(parquet)
+        expected = analyze_outputs(self.problem, self.Y, columns=[1],
+                                   names=['sum'], seed=2)
+        sa_dict = analyze_outputs(self.problem, parquet, columns=['sum'],
+                                  seed=2)
+        self.assertSameIndices(sa_dict, expected)
+
+    def test_saved_files_match(self):
+        """Does get_sa_data read back the results that were returned?"""
+        sa_dict = analyze_outputs(self.problem, self.Y, save_loc=self.dir)
+        saved = get_sa_data(self.dir + '/')
+        self.assertEqual(sorted(saved), ['0', '1'])
+        for key in sa_dict:
+            np.testing.assert_allclose(saved[key][0]['ST'],
+                                       sa_dict[key][0]['ST'], atol=1e-6)
+            np.testing.assert_allclose(saved[key][1]['S2_conf'],
+                                       sa_dict[key][1]['S2_conf'], atol=1e-6)
+
+    def test_first_order_only(self):
+        """Are there no second order results when order is 1?"""
+        X = saltelli.sample(self.problem, 64, calc_second_order=False)
+        sa_dict = analyze_outputs(self.problem, _ishigami(X), order=1)
+        self.assertFalse(sa_dict['0'][1])
+        self.assertRaises(ValueError, analyze_outputs, self.problem, self.Y,
+                          names=['one'])
+
+    def test_parallel_matches_serial(self):
+        """Do worker processes give the same results as a serial run?"""
+        serial = analyze_outputs(self.problem, self.Y, seed=4,
+                                 num_resamples=20)
+        parallel = analyze_outputs(self.problem, self.Y, seed=4,
+                                   num_resamples=20, workers=2)
+        self.assertEqual(list(parallel), list(serial))
+        for key in serial:
+            np.testing.assert_array_equal(parallel[key][0]['S1_conf'],
+                                          serial[key][0]['S1_conf'])
+            np.testing.assert_array_equal(parallel[key][1]['S2'],
+                                          serial[key][1]['S2'])
+        self.assertEqual(parallel['0'][0]['Parameter'].dtype,
+                         parallel['1'][1]['Parameter_2'].dtype)
+
+    def test_iter_streams_outputs(self):
+        """Does iter_analyze_outputs yield every output once?"""
+        names = [name for name, _ in iter_analyze_outputs(
+            self.problem, self.results, names=['a', 'b'], num_resamples=10,
+            workers=2)]
+        self.assertEqual(sorted(names), ['a', 'b'])
+
+    def test_analyze_sensitivity_writes_file(self):
+        """Does analyze_sensitivity save analysis_<name>.txt?"""
+        problem_file = os.path.join(self.dir, 'saparams.txt')
+        with open(problem_file, 'w') as f:
+            f.write('x1 -3.14159 3.14159\nx2 -3.14159 3.14159\n'
+                    'x3 -3.14159 3.14159\n')
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            sa_dict = analyze_sensitivity(problem_file, self.results, 0, ' ',
+                                          2, 'ishigami')
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(op.isfile(os.path.join(self.dir,
+                                               'analysis_ishigami.txt')))
+        self.assertEqual(list(sa_dict['ishigami'][0]['Parameter']),
+                         ['x1', 'x2', 'x3'])
+
+
+
+def _ishigami_row(x):
+    """The Ishigami function for a single parameter set."""
+    return _ishigami(x[np.newaxis])[0]
+
+
+class _CrashingModel(object):
+    """Ishigami model that counts its calls and fails on one row."""
+
+    def __init__(self, crash_row=None):
+        self.crash_row = crash_row
+        self.calls = 0
+
+    def __call__(self, x):
+        if self.calls == self.crash_row:
+            raise RuntimeError('simulated crash')
+        self.calls += 1
+        return _ishigami_row(x)
+
+
+class TestRunModel(unittest.TestCase):
+    """Tests for the checkpointed model runner run_model()"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.params = os.path.join(self.dir, 'params.npy')
+        self.results = os.path.join(self.dir, 'results.npy')
+        np.save(self.params, np.random.RandomState(1).uniform(
+            -np.pi, np.pi, (103, 3)))
+        self.expected = _ishigami(np.load(self.params))[:, np.newaxis]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_serial(self):
+        """Does run_model give the model output for every row, in order?"""
+        Y = run_model(_ishigami_row, self.params, self.results, chunk_size=10)
+        np.testing.assert_allclose(Y, self.expected)
+        np.testing.assert_allclose(np.load(self.results), self.expected)
+
+    def test_parallel_matches_serial(self):
+        """Do worker processes give the same results as a serial run?"""
+        Y = run_model(_ishigami_row, self.params, self.results, chunk_size=10,
+                      workers=2)
+        np.testing.assert_allclose(Y, self.expected)
+
+    def test_parallel_memmap(self):
+        """Do workers open a memory-mapped array themselves instead of
+        being sent all of it?"""
+        param_sets = np.load(self.params, mmap_mode='r')
+        source = _param_source(param_sets)
+        self.assertEqual(source[0], self.params)
+        self.assertIsNone(_param_source(param_sets[10:]))
+        Y = run_model(_ishigami_row, param_sets, self.results, chunk_size=10,
+                      workers=2)
+        np.testing.assert_allclose(Y, self.expected)
+
+    def test_parallel_array(self):
+        """Are the rows of an array in memory sent a chunk at a time?"""
+        Y = run_model(_ishigami_row, np.load(self.params), self.results,
+                      chunk_size=10, workers=2)
+        np.testing.assert_allclose(Y, self.expected)
+
+    def test_vectorized(self):
+        """Can the model be called with a whole chunk of rows at once?"""
+        Y = run_model(_ishigami, np.load(self.params), self.results,
+                      chunk_size=25, vectorized=True)
+        np.testing.assert_allclose(Y, self.expected)
+
+    def test_resume(self):
+        """Does a rerun after a crash only evaluate the unfinished chunks?"""
+        model = _CrashingModel(crash_row=45)
+        self.assertRaises(RuntimeError, run_model, model, self.params,
+                          self.results, chunk_size=10)
+        model = _CrashingModel()
+        Y = run_model(model, self.params, self.results, chunk_size=10)
+        self.assertEqual(model.calls, 103 - 40)
+        np.testing.assert_allclose(Y, self.expected)
+
+    def test_resume_with_other_chunk_size(self):
+        """Is resuming with a different chunk_size refused?"""
+        self.assertRaises(RuntimeError, run_model, _CrashingModel(45),
+                          self.params, self.results, chunk_size=10)
+        self.assertRaises(ValueError, run_model, _ishigami_row, self.params,
+                          self.results, chunk_size=20)
+
+
+
+def _queue_worker(filename):
+    """A worker on another host, pulling chunks from a shared queue."""
+    WorkQueue(filename).work(_ishigami_row)
+
+
+class TestWorkQueue(unittest.TestCase):
+    """Tests for running the model through a SQLite WorkQueue"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.dir, 'runs.db')
+        self.params = os.path.join(self.dir, 'params.npy')
+        self.results = os.path.join(self.dir, 'results.npy')
+        np.save(self.params, np.random.RandomState(1).uniform(
+            -np.pi, np.pi, (103, 3)))
+        self.expected = _ishigami(np.load(self.params))[:, np.newaxis]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_run_model_with_queue(self):
+        """Does run_model give the results in order through a queue?"""
+        Y = run_model(_ishigami_row, self.params, self.results,
+                      chunk_size=10, workers=2, queue=self.db)
+        np.testing.assert_allclose(Y, self.expected)
+        self.assertEqual(WorkQueue(self.db).status(),
+                         {'pending': 0, 'running': 0, 'done': 11})
+
+    def test_separate_workers(self):
+        """Can independent worker processes share the queue?"""
+        queue = WorkQueue(self.db)
+        queue.submit(np.load(self.params), chunk_size=10)
+        workers = [multiprocessing.Process(target=_queue_worker,
+                                           args=(self.db,))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        np.testing.assert_allclose(queue.gather(self.results),
+                                   self.expected)
+        np.testing.assert_allclose(np.load(self.results), self.expected)
+
+    def test_failed_chunk_is_requeued(self):
+        """Is a chunk that raised an error run again by the next worker?"""
+        queue = WorkQueue(self.db)
+        queue.submit(self.params, chunk_size=10)
+        self.assertRaises(RuntimeError, queue.work, _CrashingModel(15))
+        self.assertEqual(queue.status(),
+                         {'pending': 10, 'running': 0, 'done': 1})
+        self.assertRaises(ValueError, queue.gather, self.results)
+        self.assertEqual(queue.work(_CrashingModel()), 10)
+        np.testing.assert_allclose(queue.gather(self.results),
+                                   self.expected)
+
+    def test_lease(self):
+        """Is a chunk claimed by a lost worker given out after its lease?"""
+        WorkQueue(self.db).submit(self.params, chunk_size=10)
+        queue = WorkQueue(self.db, lease=0)
+        connection = queue._connect()
+        queue._claim(connection, 'lost-host:1')
+        connection.close()
+        WorkQueue(self.db).work(_ishigami_row)
+        self.assertEqual(queue.status()['running'], 1)
+        queue.work(_ishigami_row)
+        np.testing.assert_allclose(queue.gather(self.results),
+                                   self.expected)
+
+    def test_resubmit(self):
+        """Are finished chunks kept, and other chunk sizes refused?"""
+        queue = WorkQueue(self.db)
+        queue.submit(self.params, chunk_size=10)
+        queue.work(_ishigami_row, max_chunks=4)
+        queue.submit(self.params, chunk_size=10)
+        self.assertEqual(queue.status()['done'], 4)
+        self.assertRaises(ValueError, queue.submit, self.params, 20)
+
+
+def _slow_first_chunk(X):
+    """Ishigami model that is slow for the chunk holding the marked row
+    (a 1 in the last column), so later chunks finish first."""
+    if X[:, -1].any():
+        time.sleep(0.5)
+    return _ishigami(X)
+
+
+class TestConvergenceMonitor(unittest.TestCase):
+    """Tests for ConvergenceMonitor and stopping run_model() early"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.problem = {'num_vars': 3, 'names': ['x1', 'x2', 'x3'],
+                       'bounds': [[-np.pi, np.pi]] * 3}
+        cls.X = saltelli.sample(cls.problem, 512)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.results = os.path.join(self.dir, 'results.npy')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_indices_match_prefix(self):
+        """Are the indices those of the whole base samples received?"""
+        Y = _ishigami(self.X)
+        monitor = ConvergenceMonitor(self.problem, seed=1)
+        monitor.update(Y[:1000])
+        self.assertEqual(monitor.n, 1000 // 8)
+        expected = sobol_indices(self.problem, Y[:monitor.n * 8], seed=1)
+        for key in ('S1', 'S1_conf', 'ST', 'ST_conf'):
+            np.testing.assert_array_equal(monitor.indices[0][key],
+                                          expected[key])
+        # second order indices are not needed to decide convergence
+        self.assertNotIn('S2', monitor.indices[0])
+
+    def test_per_parameter_convergence(self):
+        """Is convergence reported for each parameter?"""
+        Y = _ishigami(self.X)
+        monitor = ConvergenceMonitor(self.problem, target=1.0, seed=1)
+        self.assertTrue(monitor.update(Y))
+        report = monitor.report()
+        self.assertEqual(list(report['Parameter']), ['x1', 'x2', 'x3'])
+        self.assertTrue(report['converged'].all())
+        self.assertTrue((report['ST_width'] <= 1.0).all())
+        monitor = ConvergenceMonitor(self.problem, target=1e-6, seed=1)
+        self.assertFalse(monitor.update(Y))
+        self.assertFalse(monitor.report()['converged'].any())
+
+    def test_stops_run_model(self):
+        """Does run_model stop once the monitor reports convergence, and
+        can the run be continued afterwards?"""
+        monitor = ConvergenceMonitor(self.problem, target=1.0, seed=1)
+        Y = run_model(_ishigami, self.X, self.results, chunk_size=256,
+                      vectorized=True, callback=monitor)
+        self.assertTrue(monitor.converged)
+        self.assertLess(len(Y), len(self.X))
+        np.testing.assert_allclose(Y[:, 0], _ishigami(self.X[:len(Y)]))
+        Y = run_model(_ishigami, self.X, self.results, chunk_size=256,
+                      vectorized=True)
+        np.testing.assert_allclose(Y[:, 0], _ishigami(self.X))
+
+    def test_constant_output_is_ignored(self):
+        """Is an output that is constant left out rather than counted as
+        converged?"""
+        Y = np.column_stack([_ishigami(self.X), np.ones(len(self.X))])
+        monitor = ConvergenceMonitor(self.problem, target=1.0, seed=1)
+        self.assertTrue(monitor.update(Y))
+        self.assertIsNone(monitor.indices[1])
+        self.assertRaises(ValueError, monitor.report, 1)
+        monitor = ConvergenceMonitor(self.problem, target=1e-6, seed=1)
+        self.assertFalse(monitor.update(Y))
+        monitor = ConvergenceMonitor(self.problem, target=1.0, seed=1)
+        self.assertFalse(monitor.update(Y[:, 1]))
+
+    def test_nan_row_is_not_converged(self):
+        """Does a NaN result (a failed run) keep the monitor from
+        reporting convergence?"""
+        Y = _ishigami(self.X)
+        Y[10] = np.nan
+        monitor = ConvergenceMonitor(self.problem, target=1.0, seed=1)
+        self.assertFalse(monitor.update(Y))
+        self.assertFalse(monitor.param_converged.any())
+
+    def test_callback_with_workers(self):
+        """Is the callback only called once the first chunk is finished
+        when workers finish later chunks first?"""
+        marked = np.column_stack([self.X, np.zeros(len(self.X))])
+        marked[0, -1] = 1
+        monitor = ConvergenceMonitor(self.problem, target=1e-6, seed=1)
+        self.assertFalse(monitor.update(np.empty(0)))
+        lengths = []
+
+        def callback(Y):
+            lengths.append(len(Y))
+            return monitor(Y)
+
+        Y = run_model(_slow_first_chunk, marked, self.results,
+                      chunk_size=256, workers=2, vectorized=True,
+                      callback=callback)
+        np.testing.assert_allclose(Y[:, 0], _ishigami(self.X))
+        # later chunks finished while the first one was running
+        self.assertGreater(lengths[0], 256)
+        self.assertEqual(lengths[-1], len(self.X))
+
 
 if __name__ == '__main__':
     unittest.main()